@@ -1,9 +1,16 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
 User = get_user_model()
 
+RECIPE_ORDERINGS = {
+    'new': ('-pub_date', '-id'),
+    'popular': ('-favorites_count', '-in_carts_count', '-pub_date', '-id'),
+}
+
 
 class IngredientFilter(FilterSet):
     """Фильтр для ингредиентов."""
@@ -16,22 +23,53 @@ class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         field_name="tags__slug",
-        to_field_name="slug")
+        to_field_name="slug",
+        method='filter_tags')
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='filter_ordering')
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
 
+    def filter_tags(self, queryset, name, tags):
+        """Фильтрует рецепты по тегам подзапросом к промежуточной
+        таблице, не размножая строки рецептов.
+        По умолчанию подходит любой из тегов, при tags_mode=all —
+        только рецепты со всеми переданными тегами."""
+        if not tags:
+            return queryset
+        recipe_tags = Recipe.tags.through.objects.filter(
+            tag_id__in={tag.id for tag in tags})
+        if self.data.get('tags_mode') == 'all':
+            return queryset.filter(pk__in=recipe_tags.values(
+                'recipe_id').annotate(tags_count=Count('tag_id')).filter(
+                tags_count=len(tags)).values('recipe_id'))
+        return queryset.filter(
+            Exists(recipe_tags.filter(recipe_id=OuterRef('pk'))))
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, описанию
+        и ингредиентам рецепта с сортировкой по релевантности."""
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        """Сортировка: new — сначала новые, popular — по числу
+        добавлений в избранное и в списки покупок."""
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
     def get_is_favorited(self, queryset, name, value):
         if value:
-            queryset = queryset.filter(favorites__user=self.request.user)
+            queryset = queryset.filter(is_favorited=True)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if value:
-            queryset = queryset.filter(shopping_cart__user=self.request.user)
+            queryset = queryset.filter(is_in_shopping_cart=True)
         return queryset
@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+from recipes.images import THUMBNAIL_SIZES
+from recipes.models import Recipe, RecipeIngredient, Tag
+
+from .serializers import CustomUserSerializer
+
+RECIPE_LIST_FIELDS = (
+    'id', 'name', 'text', 'cooking_time', 'image', *THUMBNAIL_SIZES,
+    'is_favorited', 'is_in_shopping_cart', 'author_id', 'author__email',
+    'author__username', 'author__first_name', 'author__last_name',
+)
+INGREDIENT_KEYS = ('id', 'name', 'measurement_unit', 'amount')
+
+
+def get_recipe_rows(queryset, extra_fields=()):
+    """Строки рецептов для build_recipe_list вместо объектов модели.
+    extra_fields — дополнительные поля, например ключ пагинации."""
+    fields = dict.fromkeys((*RECIPE_LIST_FIELDS, *extra_fields))
+    return queryset.prefetch_related(None).values(*fields)
+
+
+def build_recipe_list(rows, request):
+    """Быстрое представление списка рецептов, совпадающее
+    с RecipeGETSerializer(many=True).data: словари собираются
+    из строк get_recipe_rows и двух запросов за тегами
+    и ингредиентами всей страницы, без объектов модели и полей DRF."""
+    recipe_ids = [row['id'] for row in rows]
+    tags = defaultdict(list)
+    for tag in Tag.objects.filter(recipes__in=recipe_ids).values(
+            'recipes', 'id', 'name', 'color', 'slug'):
+        tags[tag.pop('recipes')].append(tag)
+    ingredients = defaultdict(list)
+    for recipe_id, *item in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids).order_by('ingredient__name').values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'):
+        ingredients[recipe_id].append(dict(zip(INGREDIENT_KEYS, item)))
+    subscribed = (
+        set() if request.user.is_anonymous
+        else CustomUserSerializer.get_subscribed_author_ids(request))
+    storage = Recipe._meta.get_field('image').storage
+    data = []
+    for row in rows:
+        image = row['image']
+        data.append({
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': {
+                'email': row['author__email'],
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'is_subscribed': row['author_id'] in subscribed,
+            },
+            'ingredients': ingredients[row['id']],
+            'is_favorited': row['is_favorited'],
+            'is_in_shopping_cart': row['is_in_shopping_cart'],
+            'name': row['name'],
+            'image': storage.url(image) if image else None,
+            'thumbnails': {
+                field_name.replace('thumbnail_', ''): storage.url(
+                    row[field_name] or image)
+                for field_name in THUMBNAIL_SIZES
+            } if image else None,
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        })
+    return data
@@ -0,0 +1,159 @@
+import json
+import math
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def get_scenarios():
+    """Список проверяемых запросов: (название, url, авторизация)."""
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    author_id = Recipe.objects.values_list('author_id', flat=True).first()
+    word = (Recipe.objects.values_list('name', flat=True).first()
+            or 'суп').split()[0]
+    prefix = (Ingredient.objects.values_list('name', flat=True).first()
+              or 'а')[:2]
+    all_tags = '&'.join(f'tags={slug}' for slug in tags)
+    return [
+        ('recipes', '/api/recipes/', False),
+        ('recipes:auth', '/api/recipes/', True),
+        ('recipes:page', '/api/recipes/?page=5&limit=10', True),
+        ('recipes:tags', f'/api/recipes/?tags={tags[0]}', True),
+        ('recipes:tags_all', f'/api/recipes/?{all_tags}&tags_mode=all',
+         True),
+        ('recipes:author', f'/api/recipes/?author={author_id}', True),
+        ('recipes:favorited', '/api/recipes/?is_favorited=1', True),
+        ('recipes:in_cart', '/api/recipes/?is_in_shopping_cart=1', True),
+        ('recipes:search', f'/api/recipes/?search={word}', True),
+        ('recipes:popular', '/api/recipes/?ordering=popular', True),
+        ('recipes:feed', '/api/recipes/feed/?cursor=', True),
+        ('subscriptions', '/api/users/subscriptions/', True),
+        ('subscriptions:limit',
+         '/api/users/subscriptions/?recipes_limit=3', True),
+        ('ingredients:name', f'/api/ingredients/?name={prefix}', False),
+        ('shopping_cart:txt', '/api/recipes/download_shopping_cart/', True),
+        ('shopping_cart:csv',
+         '/api/recipes/download_shopping_cart/?format=csv', True),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Замер времени ответа и числа SQL-запросов основных '
+            'эндпоинтов API. Данные можно подготовить командой '
+            'seed_benchmark.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--email', help='Пользователь, от имени которого выполняются '
+                            'запросы; по умолчанию первый с подписками.')
+        parser.add_argument(
+            '--output', help='Сохранить результаты в json файл.')
+        parser.add_argument(
+            '--baseline', help='json файл с прошлыми результатами: '
+                               'команда завершится ошибкой при регрессии.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95 относительно baseline, доля.')
+
+    def get_user(self, email):
+        users = User.objects.all()
+        if email:
+            users = users.filter(email=email)
+        else:
+            users = users.filter(subscriber__isnull=False)
+        user = users.first()
+        if user is None:
+            raise CommandError(
+                'Нет подходящего пользователя, запустите seed_benchmark.')
+        return user
+
+    def measure(self, client, url, iterations, warmup):
+        timings = []
+        queries = set()
+        for iteration in range(warmup + iterations):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{url}: ответ {response.status_code}.')
+            if iteration >= warmup:
+                timings.append(elapsed)
+                queries.add(len(context.captured_queries))
+        result = {f'p{percent}': round(percentile(timings, percent), 2)
+                  for percent in PERCENTILES}
+        result['max'] = round(max(timings), 2)
+        result['queries'] = max(queries)
+        return result
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: запросов {previous["queries"]} → '
+                    f'{result["queries"]}')
+            if result['p95'] > previous['p95'] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p95 {previous["p95"]} → {result["p95"]} мс')
+        return regressions
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            user = self.get_user(options['email'])
+            anonymous = APIClient()
+            authorized = APIClient()
+            authorized.force_authenticate(user)
+            results = {}
+            header = ''.join(
+                f'{column:>9}' for column in
+                [f'p{percent}' for percent in PERCENTILES]
+                + ['max', 'queries'])
+            self.stdout.write(f'{"":<22}{header}')
+            for name, url, auth in get_scenarios():
+                result = self.measure(
+                    authorized if auth else anonymous, url,
+                    options['iterations'], options['warmup'])
+                results[name] = result
+                self.stdout.write(f'{name:<22}' + ''.join(
+                    f'{value:>9}' for value in result.values()))
+        finally:
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                regressions = self.compare(
+                    results, json.load(baseline), options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n'
+                    + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий не найдено.'))
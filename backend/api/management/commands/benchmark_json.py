@@ -0,0 +1,77 @@
+import io
+import statistics
+import time
+
+from api.listings import build_recipe_list, get_recipe_rows
+from api.parsers import FastJSONParser, orjson
+from api.renderers import FastJSONRenderer
+from api.serializers import IngredientSerializer
+from api.views import RecipeViewSet
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from recipes.models import Ingredient
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+def get_payloads(page_size):
+    """Самые крупные ответы API: полный список ингредиентов
+    и страница рецептов максимального размера."""
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = AnonymousUser()
+    queryset = RecipeViewSet(
+        request=request, action='list', format_kwarg=None).get_queryset()
+    rows = list(get_recipe_rows(queryset.order_by('-pub_date', '-id'))[
+        :page_size])
+    return {
+        'ingredients': IngredientSerializer(
+            Ingredient.objects.all(), many=True).data,
+        'recipes': build_recipe_list(rows, request),
+    }
+
+
+def measure(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.mean(timings)
+
+
+class Command(BaseCommand):
+    help = ('Сравнение JSONRenderer/JSONParser DRF и FastJSONRenderer/'
+            'FastJSONParser на самых крупных ответах API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=30)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson не установлен, FastJSON* используют стандартный '
+                'json.'))
+        iterations = options['iterations']
+        self.stdout.write(
+            f'{"":<24}{"размер":>10}{"DRF, мс":>10}{"fast, мс":>10}'
+            f'{"ускорение":>11}')
+        for name, data in get_payloads(options['page_size']).items():
+            content = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != content:
+                raise CommandError(f'{name}: JSON различается.')
+            for operation, standard, fast in (
+                    ('render', lambda: JSONRenderer().render(data),
+                     lambda: FastJSONRenderer().render(data)),
+                    ('parse', lambda: JSONParser().parse(
+                        io.BytesIO(content)),
+                     lambda: FastJSONParser().parse(io.BytesIO(content)))):
+                before = measure(standard, iterations)
+                after = measure(fast, iterations)
+                self.stdout.write(
+                    f'{f"{name} {operation}":<24}{len(content):>10}'
+                    f'{before:>10.2f}{after:>10.2f}'
+                    f'{before / after:>10.1f}×')
+        self.stdout.write(self.style.SUCCESS('JSON совпадает.'))
@@ -0,0 +1,103 @@
+import statistics
+import time
+
+from api.listings import build_recipe_list, get_recipe_rows
+from api.management.commands.benchmark_api import percentile
+from api.serializers import RecipeGETSerializer
+from api.views import RecipeViewSet
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+User = get_user_model()
+
+ORDERING = ('-pub_date', '-id')
+
+
+class Command(BaseCommand):
+    help = ('Сравнение времени формирования страницы списка рецептов '
+            'через RecipeGETSerializer и build_recipe_list: загрузка '
+            'данных, сериализация и рендеринг JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=30)
+        parser.add_argument(
+            '--email', help='Пользователь, от имени которого строится '
+                            'список; по умолчанию первый с подписками.')
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Строить список для анонимного пользователя.')
+
+    def get_request(self, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return request
+
+    def get_queryset(self, request):
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None)
+        return view.get_queryset().order_by(*ORDERING)
+
+    def serializer_page(self, user, page_size):
+        request = self.get_request(user)
+        page = list(self.get_queryset(request)[:page_size])
+        data = RecipeGETSerializer(
+            page, many=True, context={'request': request}).data
+        return JSONRenderer().render(data)
+
+    def fast_page(self, user, page_size):
+        request = self.get_request(user)
+        rows = list(get_recipe_rows(self.get_queryset(request))[:page_size])
+        return JSONRenderer().render(build_recipe_list(rows, request))
+
+    def measure(self, build, user, page_size, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            build(user, page_size)
+            timings.append((time.perf_counter() - started) * 1000)
+        with CaptureQueriesContext(connection) as context:
+            content = build(user, page_size)
+        return timings, len(context.captured_queries), content
+
+    def handle(self, *args, **options):
+        if options['anonymous']:
+            user = AnonymousUser()
+        else:
+            users = User.objects.all()
+            if options['email']:
+                users = users.filter(email=options['email'])
+            else:
+                users = users.filter(subscriber__isnull=False)
+            user = users.first()
+            if user is None:
+                raise CommandError(
+                    'Нет подходящего пользователя, запустите seed_benchmark.')
+        results = {
+            name: self.measure(
+                build, user, options['page_size'], options['iterations'])
+            for name, build in (
+                ('serializer', self.serializer_page),
+                ('build_recipe_list', self.fast_page))
+        }
+        self.stdout.write(
+            f'{"":<20}{"mean":>9}{"p50":>9}{"p95":>9}{"queries":>9}')
+        for name, (timings, queries, _) in results.items():
+            self.stdout.write(
+                f'{name:<20}{statistics.mean(timings):>9.2f}'
+                f'{percentile(timings, 50):>9.2f}'
+                f'{percentile(timings, 95):>9.2f}{queries:>9}')
+        before = statistics.mean(results['serializer'][0])
+        after = statistics.mean(results['build_recipe_list'][0])
+        self.stdout.write(
+            f'Ускорение: {before / after:.1f}× на странице '
+            f'из {options["page_size"]} рецептов.')
+        if results['serializer'][2] != results['build_recipe_list'][2]:
+            raise CommandError('JSON списков рецептов различается.')
+        self.stdout.write(self.style.SUCCESS('JSON совпадает.'))
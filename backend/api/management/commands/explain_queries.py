@@ -0,0 +1,95 @@
+import re
+
+from api.management.commands.benchmark_api import get_scenarios
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SCAN = re.compile(r'SCAN (?:TABLE )?(\w+)(.*)')
+
+
+def find_seq_scans(sql, tables):
+    """Таблицы, которые план запроса читает последовательно."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN {sql}')
+            found = (
+                match.group(1) for (line,) in cursor.fetchall()
+                for match in POSTGRES_SEQ_SCAN.finditer(line))
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            found = (
+                match.group(1) for *_, detail in cursor.fetchall()
+                for match in [SQLITE_SCAN.match(detail)]
+                if match and 'USING' not in match.group(2)
+                and 'VIRTUAL TABLE' not in match.group(2))
+        else:
+            raise CommandError(
+                f'EXPLAIN для {connection.vendor} не поддерживается.')
+        return sorted({table for table in found if table in tables})
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для SQL-запросов основных эндпоинтов API '
+            'и отмечает последовательное чтение таблиц. Запускать '
+            'на данных, созданных seed_benchmark.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', help='Пользователь, от имени которого выполняются '
+                            'запросы; по умолчанию первый с подписками.')
+        parser.add_argument(
+            '--ignore', nargs='*', default=['recipes_tag'],
+            help='Небольшие таблицы, для которых полное чтение допустимо.')
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться ошибкой, если найдено полное чтение таблиц.')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['email']:
+            users = users.filter(email=options['email'])
+        else:
+            users = users.filter(subscriber__isnull=False)
+        user = users.first()
+        if user is None:
+            raise CommandError(
+                'Нет подходящего пользователя, запустите seed_benchmark.')
+        tables = set(connection.introspection.table_names())
+        tables -= set(options['ignore'])
+        anonymous = APIClient()
+        authorized = APIClient()
+        authorized.force_authenticate(user)
+        flagged = 0
+        setup_test_environment()
+        try:
+            for name, url, auth in get_scenarios():
+                client = authorized if auth else anonymous
+                with CaptureQueriesContext(connection) as context:
+                    response = client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                queries = [
+                    query['sql'] for query in context.captured_queries
+                    if query['sql'].lstrip().upper().startswith('SELECT')]
+                self.stdout.write(f'{name}: запросов {len(queries)}')
+                for sql in queries:
+                    scans = find_seq_scans(sql, tables)
+                    if scans:
+                        flagged += 1
+                        self.stdout.write(self.style.WARNING(
+                            f'  полное чтение {", ".join(scans)}: '
+                            f'{sql[:150]}'))
+        finally:
+            teardown_test_environment()
+        if flagged and options['fail']:
+            raise CommandError(
+                f'Запросов с полным чтением таблиц: {flagged}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов с полным чтением таблиц: {flagged}.'))
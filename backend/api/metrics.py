@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import defaultdict
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+COUNTERS = (
+    ('db_queries_total', 'queries', 'Число SQL-запросов.'),
+    ('db_duration_seconds_total', 'db_time',
+     'Время выполнения SQL-запросов.'),
+    ('render_duration_seconds_total', 'render_time',
+     'Время сериализации ответа.'),
+    ('response_size_bytes_total', 'size', 'Размер ответов.'),
+    ('query_budget_exceeded_total', 'over_budget',
+     'Число запросов, превысивших бюджет SQL-запросов.'),
+)
+
+
+class RequestMetrics:
+    """Показатели одного запроса.
+    Экземпляр подключается как execute_wrapper соединения с БД
+    и считает число SQL-запросов и время их выполнения."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+        self.size = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def finish_render(self, response=None):
+        self.render_time = time.perf_counter() - self.render_started
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        app_time = max(self.duration - self.db_time - self.render_time, 0)
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'app;dur={app_time * 1000:.2f}',
+            f'total;dur={self.duration * 1000:.2f}',
+        ))
+
+
+class ViewMetrics:
+    """Накопленные показатели одного представления."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.size = 0
+        self.over_budget = 0
+
+
+def escape_label(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class MetricsRegistry:
+    """Показатели запросов, агрегированные в памяти процесса.
+    При нескольких процессах сервера каждый отдает свои значения."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = defaultdict(int)
+            self.views = defaultdict(ViewMetrics)
+
+    def record(self, view, method, status, metrics, over_budget=False):
+        with self.lock:
+            self.requests[(view, method, status)] += 1
+            totals = self.views[(view, method)]
+            totals.count += 1
+            totals.duration += metrics.duration
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if metrics.duration <= bound:
+                    totals.buckets[index] += 1
+            totals.queries += metrics.queries
+            totals.db_time += metrics.db_time
+            totals.render_time += metrics.render_time
+            totals.size += metrics.size
+            totals.over_budget += over_budget
+
+    def render(self):
+        """Показатели в текстовом формате Prometheus."""
+        with self.lock:
+            requests = sorted(self.requests.items())
+            views = sorted(
+                (key, {**vars(totals), 'buckets': list(totals.buckets)})
+                for key, totals in self.views.items())
+        lines = [
+            '# HELP foodgram_http_requests_total Число обработанных запросов.',
+            '# TYPE foodgram_http_requests_total counter',
+        ]
+        lines.extend(
+            f'foodgram_http_requests_total{{view="{escape_label(view)}",'
+            f'method="{method}",status="{status}"}} {count}'
+            for (view, method, status), count in requests)
+        lines.extend((
+            '# HELP foodgram_http_request_duration_seconds '
+            'Время обработки запроса.',
+            '# TYPE foodgram_http_request_duration_seconds histogram',
+        ))
+        for (view, method), totals in views:
+            labels = f'view="{escape_label(view)}",method="{method}"'
+            for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+                lines.append(
+                    'foodgram_http_request_duration_seconds_bucket'
+                    f'{{{labels},le="{bound}"}} {count}')
+            lines.extend((
+                'foodgram_http_request_duration_seconds_bucket'
+                f'{{{labels},le="+Inf"}} {totals["count"]}',
+                'foodgram_http_request_duration_seconds_sum'
+                f'{{{labels}}} {totals["duration"]:.6f}',
+                'foodgram_http_request_duration_seconds_count'
+                f'{{{labels}}} {totals["count"]}',
+            ))
+        for name, field, description in COUNTERS:
+            lines.extend((
+                f'# HELP foodgram_{name} {description}',
+                f'# TYPE foodgram_{name} counter',
+            ))
+            lines.extend(
+                f'foodgram_{name}{{view="{escape_label(view)}",'
+                f'method="{method}"}} {round(totals[field], 6)}'
+                for (view, method), totals in views)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
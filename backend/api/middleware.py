@@ -0,0 +1,71 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import RequestMetrics, registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryMetricsMiddleware:
+    """Собирает для каждого запроса число SQL-запросов, время работы
+    с БД, время сериализации и размер ответа, добавляет заголовок
+    Server-Timing и пишет предупреждение при превышении бюджета
+    SQL-запросов: QUERY_BUDGET для чтения, QUERY_BUDGET_WRITE для
+    изменяющих запросов, которые обновляют связанные таблицы.
+    Для потоковых ответов показатели дополняются по мере отдачи
+    содержимого, в заголовок попадает только время до начала отдачи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        with connection.execute_wrapper(metrics):
+            response = self.get_response(request)
+        metrics.stop()
+        if settings.SERVER_TIMING_ENABLED:
+            response['Server-Timing'] = metrics.server_timing()
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, response.streaming_content, metrics)
+        else:
+            metrics.size = len(response.content)
+            self.record(request, response, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        """Замеряет время рендеринга ответов DRF."""
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            metrics.start_render()
+            response.add_post_render_callback(metrics.finish_render)
+        return response
+
+    def stream(self, request, response, content, metrics):
+        try:
+            with connection.execute_wrapper(metrics):
+                for chunk in content:
+                    metrics.size += len(chunk)
+                    yield chunk
+        finally:
+            metrics.stop()
+            self.record(request, response, metrics)
+
+    def record(self, request, response, metrics):
+        view = getattr(request.resolver_match, 'view_name', None)
+        view = view or 'unmatched'
+        if request.method in SAFE_METHODS:
+            budget = settings.QUERY_BUDGET
+        else:
+            budget = settings.QUERY_BUDGET_WRITE
+        over_budget = bool(budget) and metrics.queries > budget
+        if over_budget:
+            logger.warning(
+                '%s %s (%s): %d SQL-запросов при бюджете %d',
+                request.method, request.path, view, metrics.queries, budget)
+        registry.record(
+            view, request.method, response.status_code, metrics, over_budget)
@@ -0,0 +1,57 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from recipes.catalogs import get_catalog_version
+
+
+def get_feed_cache_key(user_id):
+    return f'recipe_feed:{user_id}'
+
+
+def invalidate_feeds(user_ids):
+    """Сбрасывает закэшированные первые страницы ленты пользователей
+    после фиксации текущей транзакции."""
+    keys = [get_feed_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class CatalogCacheMixin:
+    """Кэширует отрендеренный список справочника целиком
+    и поддерживает ETag/If-None-Match.
+    Ключ кэша включает версию справочника, которая меняется
+    при сохранении и удалении его объектов."""
+    catalog_name = None
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if request.query_params or renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        key = (f'catalog:{self.catalog_name}:'
+               f'{get_catalog_version(self.catalog_name)}:'
+               f'{type(renderer).__name__}')
+        cached = cache.get(key)
+        if cached is None:
+            serializer = self.get_serializer(
+                self.filter_queryset(self.get_queryset()), many=True)
+            content = renderer.render(
+                serializer.data, request.accepted_media_type,
+                self.get_renderer_context())
+            cached = (f'"{hashlib.sha1(content).hexdigest()}"', content)
+            cache.set(key, cached, settings.CATALOG_CACHE_TIMEOUT)
+        etag, content = cached
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type += f'; charset={renderer.charset}'
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, no-cache'
+        return response
@@ -1,11 +1,103 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     """Пользовательский класс, позволяет осуществлять пагинацию
     списка пользователей, списка рецептов и подписок с
-    использованием в запросе параметров номера страницы и лимита."""
+    использованием в запросе параметров номера страницы и лимита.
+    При передаче параметра cursor включается пагинация по ключу:
+    следующая страница начинается после последнего объекта предыдущей,
+    без COUNT и OFFSET. Поля ключа задаются атрибутом cursor_ordering
+    вьюсета и должны однозначно упорядочивать объекты.
+    Действия с атрибутом cursor_pagination всегда используют
+    пагинацию по ключу."""
 
     page_size = 10
     page_size_query_param = 'limit'
     max_page_size = 30
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_ordering = getattr(view, 'cursor_ordering', None)
+        cursor_pagination = (
+            getattr(view, 'cursor_pagination', False)
+            or self.cursor_query_param in request.query_params)
+        if self.cursor_ordering is None or not cursor_pagination:
+            self.cursor_ordering = None
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.cursor_ordering)
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param),
+            queryset.model)
+        if position:
+            queryset = queryset.filter(self.get_position_filter(position))
+        page = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            last = page[-1]
+            self.next_position = [
+                last[name] if isinstance(last, dict) else getattr(last, name)
+                for name in (
+                    field.lstrip('-') for field in self.cursor_ordering)]
+        return page
+
+    def get_position_filter(self, position):
+        """Условие «строго после position» для полей cursor_ordering."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.cursor_ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, position):
+        data = json.dumps([str(value) for value in position])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        """Возвращает значения полей ключа из курсора
+        или None для первой страницы."""
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.cursor_ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.cursor_ordering, values)]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        if self.cursor_ordering is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_cursor_link()),
+            ('results', data),
+        ]))
@@ -1,3 +1,6 @@
+from hmac import compare_digest
+
+from django.conf import settings
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
 
@@ -24,3 +27,15 @@ class AuthorOrReadOnly(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return request.method in SAFE_METHODS or obj.author == request.user
+
+
+class MetricsPermission(BasePermission):
+    """Доступ к показателям для администраторов или по токену
+    METRICS_TOKEN в заголовке Authorization: Bearer <токен>."""
+
+    def has_permission(self, request, view):
+        if request.user.is_staff:
+            return True
+        token = settings.METRICS_TOKEN
+        return bool(token) and compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {token}')
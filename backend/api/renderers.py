@@ -0,0 +1,116 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson, если он установлен.
+    Типы, которых нет в JSON (Decimal, даты, ленивые строки перевода),
+    кодируются так же, как в DRF, через JSONEncoder.default,
+    поэтому ответ совпадает с ответом JSONRenderer.
+    Без orjson, для ответов с отступами и при нестандартных
+    UNICODE_JSON/COMPACT_JSON работает обычный JSONRenderer."""
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context)):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        content = orjson.dumps(
+            data, default=self.encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        return content.replace(
+            '\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029')
+
+
+class EchoBuffer:
+    """Буфер-заглушка для csv.writer: возвращает записанную строку,
+    не накапливая её в памяти."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListTextRenderer(BaseRenderer):
+    """Формирует список покупок в виде текстового файла."""
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Отдает текстом ответы, сформированные не через stream,
+        например сообщения об ошибках."""
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = '\n'.join(str(value) for value in data.values())
+        return str(data).encode(self.charset)
+
+    def stream(self, username, ingredients):
+        """Построчно формирует список покупок."""
+        yield f'Список покупок пользователя: {username}'
+        for ingredient in ingredients:
+            yield (
+                f"\n{ingredient['ingredient__name']} "
+                f"({ingredient['ingredient__measurement_unit']}) "
+                f"— {ingredient['amount']}")
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    """Формирует список покупок в формате CSV."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, username, ingredients):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['ingredient__name'],
+                ingredient['ingredient__measurement_unit'],
+                ingredient['amount']))
+
+
+class ShoppingListJSONRenderer(JSONRenderer):
+    """Формирует список покупок в формате JSON."""
+
+    def stream(self, username, ingredients):
+        separator = ''
+        yield '['
+        for ingredient in ingredients:
+            yield separator + json.dumps({
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient[
+                    'ingredient__measurement_unit'],
+                'amount': ingredient['amount'],
+            }, ensure_ascii=False)
+            separator = ', '
+        yield ']'
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Отдает показатели в текстовом формате Prometheus."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Показатели передаются готовой строкой, ошибки доступа
+        отдаются текстом сообщения."""
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = '\n'.join(str(value) for value in data.values())
+        return str(data).encode(self.charset)
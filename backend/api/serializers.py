@@ -1,12 +1,24 @@
 import base64
+import binascii
+import json
+import string
+from io import BytesIO
 
 from backend_foodgram.settings import PATTERN
-from django.core.files.base import ContentFile
-from django.db.models import F
+from django.conf import settings
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.forms import ValidationError
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from PIL import Image
+from recipes.images import (THUMBNAIL_SIZES, reset_thumbnails,
+                            schedule_image_processing)
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Subscription, Tag)
+from recipes.pantry import update_postings
+from recipes.shopping_list import track_recipe_ingredients
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import User
@@ -26,8 +38,20 @@ class CustomUserSerializer(UserSerializer, UserCreateSerializer):
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        return (request and request.user.is_authenticated
-                and request.user.subscriber.filter(author=obj).exists())
+        if not request or request.user.is_anonymous:
+            return False
+        return obj.id in self.get_subscribed_author_ids(request)
+
+    @staticmethod
+    def get_subscribed_author_ids(request):
+        """Возвращает множество id авторов, на которых подписан текущий
+        пользователь. Загружается одним запросом и кэшируется на время
+        обработки запроса."""
+        if not hasattr(request, 'subscribed_author_ids'):
+            request.subscribed_author_ids = set(
+                Subscription.objects.filter(
+                    user=request.user).values_list('author_id', flat=True))
+        return request.subscribed_author_ids
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -38,14 +62,100 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
-    """Кастомное поле для работы с картинками в формате base64."""
+    """Кастомное поле для работы с картинками в формате base64.
+    Принимает также обычный файл из multipart-запроса.
+    Размер изображения проверяется до декодирования, строка base64
+    декодируется частями, а размеры в пикселях проверяются
+    по заголовку до разбора самого изображения."""
+    chunk_size = 64 * 1024
+    default_error_messages = {
+        'invalid_base64': 'Некорректное изображение в формате base64.',
+        'too_large': 'Размер изображения больше {max_size} байт.',
+        'too_big_dimensions': (
+            'Сторона изображения больше {max_dimension} пикселей.'),
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
+            data = self.decode_base64(data)
+        elif getattr(data, 'size', 0) > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        if hasattr(data, 'seek'):
+            self.check_dimensions(data)
         return super().to_internal_value(data)
 
+    def decode_base64(self, data):
+        """Декодирует data URI частями. Изображения до
+        FILE_UPLOAD_MAX_MEMORY_SIZE байт собираются в памяти, более
+        крупные — во временном файле на диске, который Django читает
+        по пути, не загружая целиком в память.
+        Переносы строк и пробелы в base64 допускаются."""
+        header_end = data.find(';base64,')
+        if header_end == -1:
+            self.fail('invalid_base64')
+        content_type = data[len('data:'):header_end]
+        start = header_end + len(';base64,')
+        length = len(data) - start - sum(
+            data.count(char, start) for char in string.whitespace)
+        padding = ''.join(data[-64:].split())[-2:].count('=')
+        size = length // 4 * 3 - padding
+        if size > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        name = f'temp.{content_type.split("/")[-1]}'
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            image_file = TemporaryUploadedFile(
+                name, content_type, size, None)
+        else:
+            image_file = InMemoryUploadedFile(
+                BytesIO(), None, name, content_type, size, None)
+        remainder = ''
+        try:
+            for offset in range(start, len(data), self.chunk_size):
+                chunk = remainder + ''.join(
+                    data[offset:offset + self.chunk_size].split())
+                end = len(chunk) // 4 * 4
+                image_file.write(base64.b64decode(chunk[:end], validate=True))
+                remainder = chunk[end:]
+            if remainder:
+                raise binascii.Error('Incorrect padding')
+        except binascii.Error:
+            image_file.close()
+            self.fail('invalid_base64')
+        image_file.size = image_file.tell()
+        image_file.seek(0)
+        return image_file
+
+    def check_dimensions(self, image_file):
+        """Проверяет размеры изображения по заголовку файла."""
+        try:
+            width, height = Image.open(image_file).size
+        except Exception:
+            return
+        finally:
+            image_file.seek(0)
+        if max(width, height) > settings.RECIPE_IMAGE_MAX_DIMENSION:
+            self.fail(
+                'too_big_dimensions',
+                max_dimension=settings.RECIPE_IMAGE_MAX_DIMENSION)
+
+
+class ThumbnailsField(serializers.Field):
+    """Поле с адресами миниатюр изображения рецепта.
+    Пока миниатюры не готовы, отдается адрес исходного изображения."""
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        return {
+            field_name.replace('thumbnail_', ''): (
+                getattr(recipe, field_name) or recipe.image).url
+            for field_name in THUMBNAIL_SIZES
+        }
+
 
 class IngredientSerializer(serializers.HyperlinkedModelSerializer):
     """Сериализатор для модели Ingredient."""
@@ -61,7 +171,6 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit')
-    amount = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeIngredient
@@ -83,6 +192,7 @@ class RecipeGETSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
     image = serializers.ReadOnlyField(source='image.url')
+    thumbnails = ThumbnailsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -90,34 +200,50 @@ class RecipeGETSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time')
+            'is_in_shopping_cart', 'name', 'image', 'thumbnails', 'text',
+            'cooking_time')
         read_only_fields = ('id', 'author', 'pub_date')
 
     def get_ingredients(self, recipe):
-        """Получает информацию об ингредиентах для рецепта."""
-        return recipe.ingredients.values(
-            "id", "name", "measurement_unit",
-            amount=F("recipe_ingredients__amount"))
+        """Получает информацию об ингредиентах для рецепта
+        из предзагруженных объектов RecipeIngredient."""
+        return RecipeIngredientSerializer(
+            recipe.recipe_ingredients.all(), many=True).data
 
     def get_is_favorited(self, obj):
         """Проверяет, добавлен ли рецепт в избранное."""
         return self.check_user_relation_to_object(
-            Favorite, obj)
+            Favorite, obj, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяет, добавлен ли рецепт в список покупок."""
         return self.check_user_relation_to_object(
-            ShoppingCart, obj)
+            ShoppingCart, obj, 'is_in_shopping_cart')
 
-    def check_user_relation_to_object(self, arg, obj):
+    def check_user_relation_to_object(self, arg, obj, annotation):
         """Проверяет отношение текущего пользователя к объекту (рецепту)
-        в контексте избранного или списка покупок."""
+        в контексте избранного или списка покупок.
+        Если рецепт получен через RecipeViewSet, используется
+        аннотация из queryset без дополнительного запроса."""
+        annotated = getattr(obj, annotation, None)
+        if annotated is not None:
+            return annotated
         current_user = self.context['request'].user
         if current_user.is_anonymous:
             return False
         return arg.objects.filter(recipe=obj, user=current_user).exists()
 
 
+class PantryRecipeSerializer(RecipeGETSerializer):
+    """Сериализатор рецепта в поиске по имеющимся ингредиентам."""
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeGETSerializer.Meta):
+        fields = RecipeGETSerializer.Meta.fields + (
+            'matched_ingredients', 'missing_ingredients')
+
+
 class RecipeCreateSerializer(RecipeGETSerializer):
     """Сериализатор для создания рецепта."""
     tags = serializers.PrimaryKeyRelatedField(
@@ -134,6 +260,25 @@ class RecipeCreateSerializer(RecipeGETSerializer):
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time')
 
+    def to_internal_value(self, data):
+        """В multipart-запросе теги передаются повторяющимся полем tags,
+        а ингредиенты — JSON-строкой в поле ingredients."""
+        if hasattr(data, 'getlist'):
+            data = self.parse_multipart(data)
+        return super().to_internal_value(data)
+
+    def parse_multipart(self, data):
+        values = data.dict()
+        if 'tags' in data:
+            values['tags'] = data.getlist('tags')
+        if isinstance(values.get('ingredients'), str):
+            try:
+                values['ingredients'] = json.loads(values['ingredients'])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'ingredients': 'Ожидается JSON-список ингредиентов.'})
+        return values
+
     def validate(self, data):
         """Проверяет валидность данных при создании рецепта."""
         ingredients = data['ingredients']
@@ -151,11 +296,40 @@ class RecipeCreateSerializer(RecipeGETSerializer):
 
     def create_ingredients(self, ingredients, recipe):
         """Создает связи между рецептом и ингредиентами."""
-        for ingredient in ingredients:
-            RecipeIngredient.objects.get_or_create(
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
                 recipe=recipe, ingredient=ingredient['id'],
                 amount=ingredient['amount'])
-
+            for ingredient in ingredients)
+        update_postings(
+            recipe.id, [ingredient['id'].id for ingredient in ingredients])
+
+    def update_ingredients(self, ingredients, recipe):
+        """Приводит ингредиенты рецепта к переданному набору:
+        добавляет новые, меняет количество у изменившихся
+        и удаляет лишние."""
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe)}
+        to_create = []
+        to_update = []
+        for ingredient in ingredients:
+            recipe_ingredient = existing.pop(ingredient['id'].id, None)
+            if recipe_ingredient is None:
+                to_create.append(ingredient)
+            elif recipe_ingredient.amount != ingredient['amount']:
+                recipe_ingredient.amount = ingredient['amount']
+                to_update.append(recipe_ingredient)
+        if existing:
+            RecipeIngredient.objects.filter(
+                pk__in=[item.pk for item in existing.values()]).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            self.create_ingredients(to_create, recipe)
+
+    @transaction.atomic
     def create(self, validated_data):
         """Создает новый рецепт."""
         ingredients = validated_data.pop('ingredients')
@@ -163,19 +337,27 @@ class RecipeCreateSerializer(RecipeGETSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        schedule_image_processing(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Обновляет рецепт."""
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        instance.ingredients.clear()
-        instance.tags.clear()
         instance.tags.set(tags)
-        self.create_ingredients(ingredients, instance)
-        return super().update(instance, validated_data)
+        with track_recipe_ingredients(instance.id):
+            self.update_ingredients(ingredients, instance)
+        recipe = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            reset_thumbnails(recipe)
+        return recipe
 
     def to_representation(self, recipe):
+        prefetch_related_objects([recipe], Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related(
+                'ingredient').order_by('ingredient__name')))
         request = self.context.get('request')
         context = {'request': request}
         return RecipeGETSerializer(recipe, context=context).data
@@ -185,9 +367,11 @@ class Limit_field_RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для представления рецептов с неполным набором
     полей в списке покупок, списке избранных рецептов и подписках."""
 
+    thumbnails = ThumbnailsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnails', 'cooking_time')
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
@@ -252,15 +436,31 @@ class SubscriptionsSerializer(UserSerializer):
         '''Проверка подписки пользователя на автора рецепта.'''
         return True
 
+    @staticmethod
+    def get_recipes_limit(request):
+        """Число рецептов автора из параметра recipes_limit,
+        по умолчанию 3, отрицательные значения считаются нулем."""
+        try:
+            recipes_limit = int(
+                request.query_params.get('recipes_limit', 3))
+        except ValueError:
+            raise serializers.ValidationError(
+                {'recipes_limit': 'Должно быть целым числом.'})
+        return max(recipes_limit, 0)
+
     def get_recipes(self, obj):
-        """Получение рецептов автора."""
-        recipes_limit = int(self.context['request'].query_params.get(
-            'recipes_limit', default=3)
-        )
-        recipes = obj.recipes.all()[:recipes_limit]
+        """Получение рецептов автора.
+        В списке подписок рецепты предзагружены в limited_recipes."""
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()[
+                :self.get_recipes_limit(self.context['request'])]
         serializer = Limit_field_RecipeSerializer(recipes, many=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
         """Получение количество рецептов автора."""
-        return obj.recipes.count()
+        recipes_count = getattr(obj, 'recipes_count', None)
+        if recipes_count is None:
+            return obj.recipes.count()
+        return recipes_count
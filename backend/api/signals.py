@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.catalogs import bump_catalog_version
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            Subscription, Tag)
+
+from .mixins import invalidate_feeds
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_catalog(sender, **kwargs):
+    """Сбрасывает кэш списка тегов."""
+    bump_catalog_version('tags')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_catalog(sender, **kwargs):
+    """Сбрасывает кэш списка ингредиентов."""
+    bump_catalog_version('ingredients')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_follower_feeds(sender, instance, **kwargs):
+    """Сбрасывает ленты подписчиков автора при публикации,
+    изменении или удалении его рецепта."""
+    invalidate_feeds(Subscription.objects.filter(
+        author_id=instance.author_id).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_user_feed(sender, instance, **kwargs):
+    """Сбрасывает ленту пользователя при изменении его подписок,
+    избранного или списка покупок: от них зависят состав ленты
+    и признаки is_favorited и is_in_shopping_cart."""
+    invalidate_feeds([instance.user_id])
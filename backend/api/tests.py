@@ -0,0 +1,366 @@
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import textwrap
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from recipes.catalogs import get_catalog_version
+from recipes.models import Ingredient, Recipe, Subscription, Tag
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from .filters import RECIPE_ORDERINGS
+from .paginations import CustomPagination
+from .serializers import Base64ImageField
+
+User = get_user_model()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        first_name='Имя', last_name='Фамилия', password='password')
+
+
+def create_recipe(author, name, **kwargs):
+    return Recipe.objects.create(
+        author=author, name=name, text=name, cooking_time=10,
+        image='recipes/images/image.jpg', **kwargs)
+
+
+class SubscriptionsTests(TestCase):
+    """Параметр recipes_limit списка подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        for number in range(4):
+            create_recipe(cls.author, f'Рецепт {number}')
+        Subscription.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_subscriptions(self, recipes_limit):
+        return self.client.get(
+            '/api/users/subscriptions/',
+            {'recipes_limit': recipes_limit})
+
+    def test_recipes_limit(self):
+        for recipes_limit, count in (('1', 1), ('10', 4), ('0', 0),
+                                     ('-1', 0)):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.get_subscriptions(recipes_limit)
+                self.assertEqual(response.status_code, 200)
+                author = response.json()['results'][0]
+                self.assertEqual(len(author['recipes']), count)
+                self.assertEqual(author['recipes_count'], 4)
+
+    def test_invalid_recipes_limit(self):
+        response = self.get_subscriptions('x')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recipes_limit', response.json())
+
+
+class MetricsTests(TestCase):
+    """Эндпоинт показателей в формате Prometheus."""
+
+    def test_metrics_for_staff(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(
+            email='admin@example.com', username='admin', first_name='А',
+            last_name='Б', password='password', is_staff=True))
+        client.get('/api/tags/')
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn(
+            b'# TYPE foodgram_http_requests_total counter',
+            response.content)
+
+    def test_metrics_forbidden(self):
+        client = APIClient()
+        client.force_authenticate(create_user('reader'))
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.content)
+
+
+class CatalogCacheTests(TestCase):
+    """Кэш справочников, ETag и его сброс после изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        cls.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', first_name='А',
+            last_name='Б', password='password')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_tags(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/tags/', **headers)
+
+    def test_not_modified(self):
+        response = self.get_tags()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        for if_none_match, status in ((etag, 304), ('*', 304),
+                                      (f'"other", {etag}', 304),
+                                      ('"other"', 200)):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.get_tags(if_none_match)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_admin_edit_invalidates_catalog(self):
+        etag = self.get_tags()['ETag']
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/admin/recipes/tag/{self.tag.id}/change/', {
+                    'name': 'Обед', 'color': '#E26C2D',
+                    'slug': 'breakfast'})
+        self.assertEqual(response.status_code, 302)
+        response = self.get_tags(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Обед')
+
+    def test_version_changes_after_commit(self):
+        version = get_catalog_version('tags')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.tag.name = 'Обед'
+            self.tag.save()
+            self.assertEqual(get_catalog_version('tags'), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_catalog_version('tags'), version)
+
+
+class CursorPaginationTests(TestCase):
+    """Пагинация списка рецептов по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        recipes = [create_recipe(author, f'Рецепт {number}')
+                   for number in range(7)]
+        now = timezone.now()
+        for number, recipe in enumerate(recipes):
+            # У нескольких рецептов совпадают дата и счетчики,
+            # порядок между ними задает id.
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(days=number // 3),
+                favorites_count=number % 2, in_carts_count=number % 3 // 2)
+
+    def walk(self, params):
+        """Проходит все страницы и возвращает id рецептов."""
+        ids = []
+        url = '/api/recipes/'
+        params = {'limit': 2, 'cursor': '', **params}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url, params = data['next'], None
+        return ids
+
+    def test_pages_follow_ordering(self):
+        for ordering, fields in RECIPE_ORDERINGS.items():
+            with self.subTest(ordering=ordering):
+                expected = list(Recipe.objects.order_by(
+                    *fields).values_list('id', flat=True))
+                self.assertEqual(self.walk({'ordering': ordering}), expected)
+
+    def test_cursor_round_trip(self):
+        paginator = CustomPagination()
+        paginator.cursor_ordering = RECIPE_ORDERINGS['popular']
+        recipe = Recipe.objects.order_by('id').first()
+        position = [recipe.favorites_count, recipe.in_carts_count,
+                    recipe.pub_date, recipe.id]
+        self.assertEqual(paginator.decode_cursor(
+            paginator.encode_cursor(position), Recipe), position)
+        self.assertIsNone(paginator.decode_cursor('', Recipe))
+
+    def test_position_filter(self):
+        paginator = CustomPagination()
+        paginator.cursor_ordering = RECIPE_ORDERINGS['popular']
+        ordered = list(Recipe.objects.order_by(*paginator.cursor_ordering))
+        for index, recipe in enumerate(ordered):
+            position = [getattr(recipe, field.lstrip('-'))
+                        for field in paginator.cursor_ordering]
+            after = Recipe.objects.filter(
+                paginator.get_position_filter(position)).order_by(
+                *paginator.cursor_ordering)
+            self.assertEqual(list(after), ordered[index + 1:])
+
+    def test_invalid_cursor(self):
+        def encode(values):
+            return base64.urlsafe_b64encode(
+                json.dumps(values).encode()).decode()
+
+        for cursor in ('!!!', encode({'id': 1}), encode(['1']),
+                       encode(['not a date', '1']), encode([1, 2, 3])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination(self):
+        response = self.client.get('/api/recipes/', {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 7)
+
+
+def create_image(size=(50, 40), image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, '#c86432').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def to_data_uri(content, line_length=None):
+    encoded = base64.b64encode(content).decode()
+    if line_length:
+        encoded = '\r\n'.join(textwrap.wrap(encoded, line_length))
+    return f'data:image/png;base64,{encoded}'
+
+
+class Base64ImageFieldTests(TestCase):
+    """Декодирование изображений рецептов и загрузка multipart."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def decode(self, data):
+        return Base64ImageField().to_internal_value(data)
+
+    def assert_invalid(self, data, code):
+        with self.assertRaises(ValidationError) as context:
+            self.decode(data)
+        self.assertEqual(context.exception.detail[0].code, code)
+
+    def test_small_image_in_memory(self):
+        content = create_image()
+        image = self.decode(to_data_uri(content))
+        self.assertIsInstance(image, InMemoryUploadedFile)
+        self.assertEqual(image.size, len(content))
+        self.assertEqual(image.read(), content)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_large_image_on_disk(self):
+        content = create_image((400, 300))
+        image = self.decode(to_data_uri(content))
+        self.assertIsInstance(image, TemporaryUploadedFile)
+        self.assertTrue(os.path.exists(image.temporary_file_path()))
+        self.assertEqual(image.size, len(content))
+        self.assertEqual(image.read(), content)
+        image.close()
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_wrapped_base64(self):
+        content = create_image((400, 300))
+        for line_length in (76, 77):
+            with self.subTest(line_length=line_length):
+                image = self.decode(to_data_uri(content, line_length))
+                self.assertEqual(image.read(), content)
+                image.close()
+
+    def test_invalid_base64(self):
+        encoded = base64.b64encode(create_image()).decode()
+        for data in ('data:image/png;base64,',
+                     'data:image/png;base64,' + encoded[:-1],
+                     'data:image/png;base64,ab!c' + encoded,
+                     'data:image/png,' + encoded):
+            with self.subTest(data=data[:30]):
+                with self.assertRaises(ValidationError):
+                    self.decode(data)
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=100)
+    def test_size_limit(self):
+        self.assert_invalid(to_data_uri(create_image()), 'too_large')
+        self.assert_invalid(
+            to_data_uri(create_image(), line_length=4), 'too_large')
+
+    @override_settings(RECIPE_IMAGE_MAX_DIMENSION=45)
+    def test_dimension_limit(self):
+        self.assert_invalid(
+            to_data_uri(create_image((50, 40))), 'too_big_dimensions')
+        self.decode(to_data_uri(create_image((45, 45))))
+
+    def recipe_data(self, image):
+        return {
+            'name': 'Блины', 'text': 'Блины', 'cooking_time': 10,
+            'tags': [self.tag.id], 'image': image,
+            'ingredients': [{'id': self.ingredient.id, 'amount': 200}],
+        }
+
+    def test_api_rejects_invalid_image(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data('data:image/png;base64,!!!!'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
+
+    def test_json_upload(self):
+        response = self.client.post(
+            '/api/recipes/', self.recipe_data(to_data_uri(create_image())),
+            format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_multipart_upload(self):
+        content = create_image()
+        data = self.recipe_data(
+            SimpleUploadedFile('image.png', content, 'image/png'))
+        data['ingredients'] = json.dumps(data['ingredients'])
+        response = self.client.post(
+            '/api/recipes/', data, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertEqual(recipe.image.read(), content)
+        self.assertEqual(
+            list(recipe.tags.values_list('id', flat=True)), [self.tag.id])
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=100)
+    def test_multipart_size_limit(self):
+        data = self.recipe_data(
+            SimpleUploadedFile('image.png', create_image(), 'image/png'))
+        data['ingredients'] = json.dumps(data['ingredients'])
+        response = self.client.post(
+            '/api/recipes/', data, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
@@ -1,24 +1,37 @@
 from api.paginations import CustomPagination
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.db.models import (Count, Exists, F, OuterRef, Prefetch, Subquery,
+                              Value)
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Subscription, Tag)
+                            ShoppingCart, ShoppingListItem, Subscription, Tag)
+from recipes.pantry import find_recipes_by_ingredients
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from .filters import IngredientFilter, RecipeFilter
-from .permissions import AuthorOrReadOnly
+from .filters import RECIPE_ORDERINGS, IngredientFilter, RecipeFilter
+from .listings import build_recipe_list, get_recipe_rows
+from .metrics import registry
+from .mixins import CatalogCacheMixin, get_feed_cache_key
+from .permissions import AuthorOrReadOnly, MetricsPermission
+from .renderers import (PrometheusRenderer, ShoppingListCSVRenderer,
+                        ShoppingListJSONRenderer, ShoppingListTextRenderer)
 from .serializers import (FavoriteRecipeSerializer, IngredientSerializer,
-                          Limit_field_RecipeSerializer, RecipeCreateSerializer,
-                          RecipeGETSerializer, ShoppingCartRecipeSerializer,
+                          Limit_field_RecipeSerializer, PantryRecipeSerializer,
+                          RecipeCreateSerializer, RecipeGETSerializer,
+                          ShoppingCartRecipeSerializer,
                           SubscriptionsSerializer, TagSerializer)
 
 User = get_user_model()
@@ -27,6 +40,7 @@ User = get_user_model()
 class CustomUserViewSet(UserViewSet):
     """Вьюсет для кастомной модели пользователей."""
     pagination_class = CustomPagination
+    cursor_ordering = ('id',)
 
     @action(methods=["GET"],
             detail=False,
@@ -35,8 +49,15 @@ class CustomUserViewSet(UserViewSet):
     def subscriptions(self, request):
         """Метод для получения списка подписок."""
         user = request.user
-        paginated_queryset = self.paginate_queryset(
-            User.objects.filter(subscribing__user=user))
+        recipes_limit = SubscriptionsSerializer.get_recipes_limit(request)
+        limited_recipes = Recipe.objects.filter(pk__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')).values('pk')[:recipes_limit]))
+        queryset = User.objects.filter(subscribing__user=user).annotate(
+            recipes_count=Count('recipes')
+        ).order_by('id').prefetch_related(Prefetch(
+            'recipes', queryset=limited_recipes, to_attr='limited_recipes'))
+        paginated_queryset = self.paginate_queryset(queryset)
         serializer = SubscriptionsSerializer(
             paginated_queryset, many=True, context={'request': request})
         return self.get_paginated_response(serializer.data)
@@ -60,16 +81,18 @@ class CustomUserViewSet(UserViewSet):
             return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, ReadOnlyModelViewSet):
     """Вьюсет для модели Tag."""
+    catalog_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, ReadOnlyModelViewSet):
     """Вьюсет для модели Ingredient."""
+    catalog_name = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -77,16 +100,67 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     search_fields = ('name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Поиск по названию обслуживается индексом в памяти:
+        сначала совпадения по началу названия, затем по вхождению."""
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(
+            name, settings.INGREDIENT_SEARCH_LIMIT))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет для модели Recipe."""
     queryset = Recipe.objects.prefetch_related(
-        'tags', 'ingredients').select_related('author').all()
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related(
+                'ingredient').order_by('ingredient__name'))
+    ).select_related('author').all()
     serializer_class = RecipeGETSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, AuthorOrReadOnly,)
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    cursor_pagination = False
+
+    @property
+    def cursor_ordering(self):
+        """Поля ключа пагинации по курсору совпадают с выбранной
+        сортировкой."""
+        return RECIPE_ORDERINGS.get(
+            self.request.query_params.get('ordering'),
+            RECIPE_ORDERINGS['new'])
+
+    def get_queryset(self):
+        """Добавляет к рецептам признаки избранного и списка покупок
+        текущего пользователя одним запросом."""
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False))
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))))
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов собирается build_recipe_list из строк
+        .values() без объектов модели и сериализатора DRF."""
+        return self.get_recipe_list_response(
+            self.filter_queryset(self.get_queryset()))
+
+    def get_recipe_list_response(self, queryset):
+        rows = get_recipe_rows(queryset, [
+            field.lstrip('-') for field in self.cursor_ordering])
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(
+            build_recipe_list(page, self.request))
 
     def get_serializer_class(self):
         """Определяет класс сериализатора в зависимости от метода запроса."""
@@ -144,29 +218,94 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Добавление/удаление рецепта в/из список(ка) покупок."""
         return self.add_to_favorite_or_shopping_cart(request, 'shopping_cart')
 
+    @action(detail=False, methods=['GET'], url_path='by_ingredients')
+    def by_ingredients(self, request):
+        """Подбирает рецепты по имеющимся ингредиентам.
+        Ингредиенты передаются параметром ingredients (id через запятую
+        или несколькими параметрами), рецепты упорядочены по числу
+        найденных и затем недостающих ингредиентов."""
+        try:
+            ingredient_ids = {
+                int(ingredient_id)
+                for value in request.query_params.getlist('ingredients')
+                for ingredient_id in value.split(',') if ingredient_id}
+            limit = int(request.query_params.get(
+                'limit', CustomPagination.page_size))
+        except ValueError:
+            raise ValidationError(
+                'Параметры ingredients и limit должны быть числами.')
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'})
+        limit = min(max(limit, 1), CustomPagination.max_page_size)
+        ranking = find_recipes_by_ingredients(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in ranking])
+        result = []
+        for recipe_id, matched, missing in ranking:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.matched_ingredients = matched
+            recipe.missing_ingredients = missing
+            result.append(recipe)
+        serializer = PantryRecipeSerializer(
+            result, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=[IsAuthenticated, ],
+            cursor_pagination=True)
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь,
+        с пагинацией по курсору. Первая страница без параметров
+        кэшируется на FEED_CACHE_TIMEOUT секунд и сбрасывается,
+        когда автор из подписок публикует или меняет рецепт."""
+        key = None
+        if not request.query_params:
+            key = get_feed_cache_key(request.user.id)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+        response = self.get_recipe_list_response(
+            self.filter_queryset(self.get_queryset()).filter(
+                author__in=Subscription.objects.filter(
+                    user=request.user).values('author_id')))
+        if key is not None:
+            cache.set(key, response.data, settings.FEED_CACHE_TIMEOUT)
+        return response
+
     @action(detail=False, methods=['GET'],
-            permission_classes=[IsAuthenticated, ])
+            permission_classes=[IsAuthenticated, ],
+            renderer_classes=[ShoppingListTextRenderer,
+                              ShoppingListCSVRenderer,
+                              ShoppingListJSONRenderer])
     def download_shopping_cart(self, request):
-        """Генерирует и отправляет файл со списком покупок пользователя."""
+        """Генерирует и отправляет файл со списком покупок пользователя.
+        Формат файла выбирается параметром format: txt, csv или json."""
         user = self.request.user
-        filename = f'{user.username}_shopping_list.txt'
-        ingredients_cart = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=self.request.user
+        renderer = request.accepted_renderer
+        filename = f'{user.username}_shopping_list.{renderer.format}'
+        ingredients_cart = ShoppingListItem.objects.filter(
+            user=self.request.user
         ).values(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).order_by('ingredient__name').annotate(
-            amount=Sum('amount')).order_by('-amount')
-
-        shopping_list_text = [f'Список покупок пользователя: {user.username}']
-        for ingredient in ingredients_cart:
-            shopping_item = (
-                f"{ingredient['ingredient__name']} "
-                f"({ingredient['ingredient__measurement_unit']}) "
-                f"— {ingredient['amount']}")
-            shopping_list_text.append(shopping_item)
-        shopping_list_text = '\n'.join(shopping_list_text)
-        response = HttpResponse(shopping_list_text, content_type='text/plain')
+            'ingredient__measurement_unit',
+            amount=F('total_amount')
+        ).order_by('-total_amount', 'ingredient__name')
+
+        response = StreamingHttpResponse(
+            renderer.stream(user.username, ingredients_cart.iterator()),
+            content_type=f'{renderer.media_type}; charset=utf-8')
         response['Content-Disposition'] = f'attachment; filename={filename}'
 
         return response
+
+
+class MetricsView(APIView):
+    """Показатели запросов текущего процесса для Prometheus."""
+    permission_classes = (MetricsPermission,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(registry.render())
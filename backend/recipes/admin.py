@@ -2,8 +2,10 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
+from .images import reset_thumbnails
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Subscription, Tag)
+from .shopping_list import track_recipe_ingredients
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -40,7 +42,8 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = '-empty-'
     list_editable = ('author',)
     list_display = ('pk', 'name', 'author', 'text', 'cooking_time',
-                    'display_image', 'pub_date')
+                    'display_image', 'pub_date', 'favorites_count',
+                    'in_carts_count')
     list_display_links = ('name',)
     list_filter = ('author', 'name', 'tags')
     search_fields = ('name',)
@@ -48,16 +51,17 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = [RecipeIngredientInline]
 
     def display_image(self, obj):
+        image = obj.thumbnail_small or obj.image
         return format_html(
-            f'<img src="{obj.image.url}" '
+            f'<img src="{image.url}" '
             f'style="max-height: 100px; max-width: 100px;" />')
 
     display_image.short_description = 'Image'
 
     def num_favorites(self, obj):
-        """Подсчитывает количество избранных рецептов
+        """Количество добавлений рецепта в избранное
         для отображения в админке."""
-        return obj.favorites.count()
+        return obj.favorites_count
 
     num_favorites.short_description = 'Избранное'
 
@@ -66,9 +70,19 @@ class RecipeAdmin(admin.ModelAdmin):
     readonly_fields = ('preview', 'num_favorites',)
 
     def preview(self, obj):
-        return mark_safe(f'<img src="{obj.image.url}" '
+        image = obj.thumbnail_medium or obj.image
+        return mark_safe(f'<img src="{image.url}" '
                          f'style="max-height: 200px; max-width: 200px;"/>')
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            reset_thumbnails(obj)
+
+    def save_related(self, request, form, formsets, change):
+        with track_recipe_ingredients(form.instance.pk):
+            super().save_related(request, form, formsets, change)
+
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
@@ -79,6 +93,22 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     list_filter = ('recipe__name',)
     search_fields = ('recipe__name', 'ingredient__name')
 
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.add(form.initial.get('recipe'))
+        with track_recipe_ingredients(*recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with track_recipe_ingredients(obj.recipe_id):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        with track_recipe_ingredients(*recipe_ids):
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -0,0 +1,22 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_catalog_version(catalog_name):
+    """Возвращает текущую версию справочника."""
+    return cache.get_or_set(
+        f'catalog:{catalog_name}:version', lambda: uuid.uuid4().hex,
+        settings.CATALOG_CACHE_TIMEOUT)
+
+
+def bump_catalog_version(catalog_name):
+    """Меняет версию справочника после фиксации текущей транзакции,
+    делая недействительными закэшированные ответы. Если сменить
+    версию раньше, запрос, пришедший до фиксации, закэширует
+    под новой версией старые данные."""
+    transaction.on_commit(lambda: cache.set(
+        f'catalog:{catalog_name}:version', uuid.uuid4().hex,
+        settings.CATALOG_CACHE_TIMEOUT))
@@ -0,0 +1,52 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipe, ShoppingCart
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def change_recipe_counter(model, recipe_id, delta):
+    """Атомарно меняет счетчик рецепта для модели Favorite
+    или ShoppingCart, не опуская его ниже нуля."""
+    field = COUNTERS[model]
+    recipes = Recipe.objects.filter(pk=recipe_id)
+    if delta < 0:
+        recipes = recipes.filter(**{f'{field}__gte': -delta})
+    recipes.update(**{field: F(field) + delta})
+
+
+def get_live_counters():
+    """Выражения, считающие счетчики рецепта по связанным таблицам."""
+    return {
+        field: Coalesce(Subquery(
+            model.objects.filter(recipe_id=OuterRef('pk')).order_by(
+            ).values('recipe_id').annotate(total=Count('pk')).values(
+                'total')), 0)
+        for model, field in COUNTERS.items()
+    }
+
+
+def get_drifted_recipes():
+    """Рецепты, у которых сохраненные счетчики расходятся
+    с фактическими, с аннотациями live_<поле>."""
+    live = {
+        f'live_{field}': expression
+        for field, expression in get_live_counters().items()
+    }
+    mismatch = Q()
+    for field in COUNTERS.values():
+        mismatch |= ~Q(**{field: F(f'live_{field}')})
+    return Recipe.objects.annotate(**live).filter(mismatch)
+
+
+def reconcile_counters(recipe_ids=None):
+    """Пересчитывает счетчики переданных рецептов, а без аргумента —
+    всех. Возвращает число обновленных рецептов."""
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    return recipes.update(**get_live_counters())
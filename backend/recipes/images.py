@@ -0,0 +1,101 @@
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = {
+    'thumbnail_small': (300, 300),
+    'thumbnail_medium': (800, 800),
+}
+
+if features.check('webp'):
+    THUMBNAIL_FORMAT, THUMBNAIL_EXTENSION = 'WEBP', 'webp'
+else:
+    THUMBNAIL_FORMAT, THUMBNAIL_EXTENSION = 'JPEG', 'jpg'
+
+
+def make_thumbnail(image, size):
+    """Уменьшает изображение с сохранением пропорций
+    и перекодирует его в формат миниатюр."""
+    thumbnail = image.copy()
+    thumbnail.thumbnail(size)
+    buffer = BytesIO()
+    thumbnail.save(buffer, THUMBNAIL_FORMAT, quality=85)
+    return ContentFile(buffer.getvalue())
+
+
+def process_recipe_image(recipe_id):
+    """Проверяет изображение рецепта и создает миниатюры.
+    Если за время обработки изображение сменилось, результат
+    не сохраняется в рецепт: для нового изображения поставлена своя
+    задача, а файлы удалит collect_media_garbage."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    source_name = recipe.image.name
+    with recipe.image.open('rb') as image_file:
+        image = Image.open(image_file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA') or THUMBNAIL_FORMAT == 'JPEG':
+        image = image.convert('RGB')
+    thumbnails = {}
+    for field_name, size in THUMBNAIL_SIZES.items():
+        field = getattr(recipe, field_name)
+        field.save(
+            f'{field_name}.{THUMBNAIL_EXTENSION}',
+            make_thumbnail(image, size), save=False)
+        thumbnails[field_name] = field.name
+    Recipe.objects.filter(
+        pk=recipe_id, image=source_name).update(**thumbnails)
+
+
+def reset_thumbnails(recipe):
+    """Сбрасывает миниатюры после смены изображения рецепта
+    и ставит создание новых в очередь. Recipe.save не записывает
+    поля миниатюр, поэтому они очищаются отдельным UPDATE."""
+    recipe.thumbnail_small = recipe.thumbnail_medium = ''
+    Recipe.objects.filter(pk=recipe.pk).update(
+        thumbnail_small='', thumbnail_medium='')
+    schedule_image_processing(recipe)
+
+
+def schedule_image_processing(recipe):
+    """Ставит обработку изображения рецепта в очередь
+    после фиксации транзакции."""
+    transaction.on_commit(lambda: enqueue(process_recipe_image, recipe.pk))
+
+
+def generate_missing_thumbnails():
+    """Создает миниатюры рецептов, у которых их нет: созданных
+    до появления миниатюр или загруженных import_recipes
+    и seed_benchmark. Одинаковые изображения обрабатываются
+    один раз, остальным рецептам копируются имена готовых миниатюр.
+    Возвращает число обработанных изображений."""
+    missing = Recipe.objects.exclude(image='').filter(thumbnail_small='')
+    processed = 0
+    for image in list(missing.order_by('image').values_list(
+            'image', flat=True).distinct()):
+        recipe_id = missing.filter(image=image).values_list(
+            'pk', flat=True).first()
+        if recipe_id is None:
+            continue
+        try:
+            process_recipe_image(recipe_id)
+        except Exception:
+            logger.exception('Не удалось обработать изображение %s', image)
+            continue
+        thumbnails = Recipe.objects.filter(
+            pk=recipe_id, image=image).exclude(
+            thumbnail_small='').values(*THUMBNAIL_SIZES).first()
+        if thumbnails:
+            missing.filter(image=image).update(**thumbnails)
+            processed += 1
+    return processed
@@ -0,0 +1,67 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+    Хранит отсортированный список названий в нижнем регистре:
+    совпадения по началу названия находятся бинарным поиском,
+    затем при нехватке результатов добавляются совпадения
+    по вхождению подстроки.
+    Строится при первом обращении, сбрасывается при изменении
+    ингредиентов и не живет дольше INGREDIENT_INDEX_TTL секунд,
+    чтобы подхватывать изменения из других процессов."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._rows = None
+        self._built_at = 0
+
+    def invalidate(self):
+        """Сбрасывает индекс, он будет построен заново при обращении."""
+        with self._lock:
+            self._keys = None
+            self._rows = None
+
+    def _get_entries(self):
+        with self._lock:
+            expired = (
+                time.monotonic() - self._built_at
+                > settings.INGREDIENT_INDEX_TTL)
+            if self._keys is None or expired:
+                rows = sorted(
+                    Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit'),
+                    key=lambda row: (row['name'].casefold(), row['id']))
+                self._keys = [row['name'].casefold() for row in rows]
+                self._rows = rows
+                self._built_at = time.monotonic()
+            return self._keys, self._rows
+
+    def search(self, query, limit):
+        """Возвращает до limit ингредиентов, название которых начинается
+        с query, а следом — содержащих query в середине названия."""
+        keys, rows = self._get_entries()
+        query = query.casefold()
+        result = []
+        index = bisect_left(keys, query)
+        while (index < len(keys) and len(result) < limit
+               and keys[index].startswith(query)):
+            result.append(rows[index])
+            index += 1
+        if len(result) < limit:
+            for key, row in zip(keys, rows):
+                if query in key and not key.startswith(query):
+                    result.append(row)
+                    if len(result) >= limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
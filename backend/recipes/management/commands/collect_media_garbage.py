@@ -0,0 +1,72 @@
+import os
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.core.management import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from recipes.models import Recipe
+from recipes.storage import content_addressed_storage
+from recipes.utils import upload_to
+
+IMAGE_FIELDS = ('image', 'thumbnail_small', 'thumbnail_medium')
+
+
+class Command(BaseCommand):
+    help = ('Удаление файлов изображений, на которые не ссылается '
+            'ни один рецепт.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=24,
+            help='Не трогать файлы моложе указанного числа часов, '
+                 'чтобы не удалить изображения загружаемых рецептов.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены.')
+
+    def walk(self, storage, path):
+        directories, files = storage.listdir(path)
+        for name in files:
+            yield os.path.join(path, name)
+        for directory in directories:
+            yield from self.walk(storage, os.path.join(path, directory))
+
+    def delete_if_unused(self, storage, name, threshold):
+        """Повторно проверяет файл перед удалением: пока строился
+        список ссылок, его могли загрузить снова для нового рецепта."""
+        if storage.get_modified_time(name) > threshold:
+            return False
+        if Recipe.objects.filter(
+                reduce(or_, (Q(**{field: name}) for field in IMAGE_FIELDS))
+        ).exists():
+            return False
+        storage.delete(name)
+        return True
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        root = os.path.dirname(upload_to(Recipe(), ''))
+        if not storage.exists(root):
+            return
+        referenced = set()
+        for names in Recipe.objects.values_list(*IMAGE_FIELDS).iterator():
+            referenced.update(name for name in names if name)
+        threshold = timezone.now() - timedelta(hours=options['min_age'])
+        removed = 0
+        freed = 0
+        for name in self.walk(storage, root):
+            if (name in referenced
+                    or storage.get_modified_time(name) > threshold):
+                continue
+            size = storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            elif not self.delete_if_unused(storage, name, threshold):
+                continue
+            freed += size
+            removed += 1
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {freed} байт.'))
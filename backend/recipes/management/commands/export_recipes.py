@@ -0,0 +1,88 @@
+import base64
+import json
+import sys
+
+from django.core.management import BaseCommand
+from django.db.models import Prefetch
+from recipes.models import Recipe, RecipeIngredient
+
+
+def serialize_recipe(recipe, with_images):
+    """Представление рецепта в виде строки NDJSON."""
+    data = {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'author': {
+            'email': recipe.author.email,
+            'username': recipe.author.username,
+            'first_name': recipe.author.first_name,
+            'last_name': recipe.author.last_name,
+        },
+        'tags': [
+            {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+        'image': recipe.image.name,
+    }
+    if with_images and recipe.image:
+        with recipe.image.open('rb') as image_file:
+            data['image_data'] = base64.b64encode(
+                image_file.read()).decode()
+    return json.dumps(data, ensure_ascii=False)
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов в формате NDJSON (один рецепт на строку).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию стандартный вывод.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--with-images', action='store_true',
+            help='Включить содержимое изображений в base64.')
+
+    def iterate_recipes(self, chunk_size):
+        """Перебирает рецепты порциями по возрастанию id,
+        загружая связанные объекты для каждой порции."""
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient').order_by('ingredient__name'))
+        ).order_by('pk')
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                return
+            yield from chunk
+            last_pk = chunk[-1].pk
+
+    def handle(self, *args, **options):
+        output = (
+            sys.stdout if options['path'] == '-'
+            else open(options['path'], 'w', encoding='utf-8'))
+        exported = 0
+        try:
+            for recipe in self.iterate_recipes(options['chunk_size']):
+                output.write(
+                    serialize_recipe(recipe, options['with_images']) + '\n')
+                exported += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {exported}.'))
@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+from recipes.images import generate_missing_thumbnails
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создание миниатюр для рецептов, у которых их нет, '
+            'например после import_recipes или seed_benchmark.')
+
+    def handle(self, *args, **options):
+        processed = generate_missing_thumbnails()
+        missing = Recipe.objects.exclude(image='').filter(
+            thumbnail_small='').count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}, '
+            f'рецептов без миниатюр: {missing}.'))
@@ -0,0 +1,273 @@
+import base64
+import json
+import multiprocessing
+import os
+import zlib
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils.dateparse import parse_datetime
+from recipes.catalogs import bump_catalog_version
+from recipes.images import generate_missing_thumbnails
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.pantry import rebuild_postings
+from recipes.search import update_search_index
+from recipes.storage import content_addressed_storage
+from recipes.utils import upload_to
+
+User = get_user_model()
+
+RecipeTag = Recipe.tags.through
+
+
+def read_records(path):
+    """Построчно читает рецепты из файла NDJSON."""
+    with open(path, encoding='utf-8') as ndjson_file:
+        for line in ndjson_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def get_partition(record, workers):
+    """Номер обработчика для рецепта: все рецепты одного автора
+    попадают в один обработчик."""
+    return zlib.crc32(record['author']['email'].encode()) % workers
+
+
+def create_missing_ingredients(path, batch_size):
+    """Создает ингредиенты из файла, которых еще нет в БД."""
+    names = {
+        (item['name'], item['measurement_unit'])
+        for record in read_records(path)
+        for item in record['ingredients']
+    }
+    before = Ingredient.objects.count()
+    names = iter(names)
+    while True:
+        batch = list(islice(names, batch_size))
+        if not batch:
+            break
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=measurement_unit)
+             for name, measurement_unit in batch),
+            ignore_conflicts=True)
+    created = Ingredient.objects.count() - before
+    if created:
+        bump_catalog_version('ingredients')
+    return created
+
+
+def get_tag_slug(tag):
+    """В ранних выгрузках тег записан только slug, в новых —
+    словарем с названием и цветом."""
+    return tag if isinstance(tag, str) else tag['slug']
+
+
+def create_missing_tags(path):
+    """Создает теги из файла, которых еще нет в БД. Возвращает
+    число созданных тегов и {slug: число рецептов} для тегов,
+    которых после этого нет в БД: записанных только slug или
+    совпадающих с имеющимися по названию или цвету."""
+    tags = {}
+    references = Counter()
+    for record in read_records(path):
+        for tag in record['tags']:
+            references[get_tag_slug(tag)] += 1
+            if isinstance(tag, dict):
+                tags.setdefault(tag['slug'], tag)
+    existing = set(Tag.objects.filter(
+        slug__in=references).values_list('slug', flat=True))
+    Tag.objects.bulk_create(
+        (Tag(name=tag['name'], color=tag['color'], slug=slug)
+         for slug, tag in tags.items() if slug not in existing),
+        ignore_conflicts=True)
+    found = set(Tag.objects.filter(
+        slug__in=references).values_list('slug', flat=True))
+    if len(found) > len(existing):
+        bump_catalog_version('tags')
+    missing = {slug: count for slug, count in references.items()
+               if slug not in found}
+    return len(found) - len(existing), missing
+
+
+class RecipeImporter:
+    """Загружает рецепты порциями: рецепты, связи с тегами
+    и ингредиенты рецептов создаются через bulk_create,
+    ссылки на теги и ингредиенты берутся из словарей в памяти."""
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, measurement_unit): ingredient_id
+            for ingredient_id, name, measurement_unit
+            in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit').iterator()
+        }
+        self.imported = 0
+        self.skipped = 0
+
+    def import_file(self, path, worker=0, workers=1):
+        records = (
+            record for record in read_records(path)
+            if get_partition(record, workers) == worker)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                return self.imported, self.skipped
+            self.import_chunk(chunk)
+
+    def resolve_authors(self, records):
+        """Возвращает {email: id} авторов, создавая недостающих
+        пользователей без пароля."""
+        authors = {record['author']['email']: record['author']
+                   for record in records}
+        users = dict(User.objects.filter(
+            email__in=authors).values_list('email', 'id'))
+        missing = [author for email, author in authors.items()
+                   if email not in users]
+        if missing:
+            User.objects.bulk_create(
+                (User(
+                    email=author['email'], username=author['username'],
+                    first_name=author['first_name'],
+                    last_name=author['last_name'],
+                    password=make_password(None))
+                 for author in missing),
+                ignore_conflicts=True)
+            users.update(User.objects.filter(
+                email__in=[author['email'] for author in missing]
+            ).values_list('email', 'id'))
+        return users
+
+    def get_image(self, record):
+        """Сохраняет изображение из image_data или возвращает
+        имя уже имеющегося файла."""
+        if not record.get('image_data'):
+            return record['image']
+        extension = os.path.splitext(record['image'])[1] or '.jpg'
+        return content_addressed_storage.save(
+            upload_to(Recipe(), f'image{extension}'),
+            ContentFile(base64.b64decode(record['image_data'])))
+
+    @transaction.atomic
+    def import_chunk(self, records):
+        authors = self.resolve_authors(records)
+        existing = set(Recipe.objects.filter(
+            author_id__in=authors.values(),
+            name__in={record['name'] for record in records}
+        ).values_list('author_id', 'name'))
+        new_records = {}
+        for record in records:
+            author_id = authors.get(record['author']['email'])
+            key = (author_id, record['name'])
+            if author_id is None or key in existing or key in new_records:
+                self.skipped += 1
+                continue
+            new_records[key] = record
+        if not new_records:
+            return
+        recipes = [
+            Recipe(
+                author_id=author_id, name=record['name'],
+                text=record['text'], cooking_time=record['cooking_time'],
+                image=self.get_image(record))
+            for (author_id, _), record in new_records.items()
+        ]
+        Recipe.objects.bulk_create(recipes)
+        recipe_ids = {
+            (author_id, name): recipe_id
+            for recipe_id, author_id, name in Recipe.objects.filter(
+                author_id__in={author_id for author_id, _ in new_records},
+                name__in={name for _, name in new_records}
+            ).values_list('id', 'author_id', 'name')
+        }
+        recipe_tags = []
+        recipe_ingredients = []
+        for recipe in recipes:
+            record = new_records[(recipe.author_id, recipe.name)]
+            recipe.pk = recipe_ids[(recipe.author_id, recipe.name)]
+            if record.get('pub_date'):
+                recipe.pub_date = parse_datetime(record['pub_date'])
+            recipe_tags.extend(
+                RecipeTag(recipe_id=recipe.pk, tag_id=self.tags[slug])
+                for slug in map(get_tag_slug, record['tags'])
+                if slug in self.tags)
+            recipe_ingredients.extend(
+                RecipeIngredient(
+                    recipe_id=recipe.pk, amount=item['amount'],
+                    ingredient_id=self.ingredients[
+                        (item['name'], item['measurement_unit'])])
+                for item in record['ingredients'])
+        Recipe.objects.bulk_update(
+            [recipe for recipe in recipes if recipe.pub_date], ['pub_date'])
+        RecipeTag.objects.bulk_create(recipe_tags)
+        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        update_search_index(*(recipe.pk for recipe in recipes))
+        self.imported += len(recipes)
+
+
+def import_partition(path, worker, workers, chunk_size):
+    """Загрузка рецептов одного обработчика в отдельном процессе."""
+    try:
+        return RecipeImporter(chunk_size).import_file(path, worker, workers)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Загрузка рецептов из файла NDJSON, созданного export_recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON с рецептами.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов; рецепты распределяются между ними '
+                 'по авторам.')
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться ошибкой до загрузки рецептов, если теги '
+                 'из файла нельзя найти или создать.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        chunk_size = options['chunk_size']
+        workers = max(options['workers'], 1)
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stderr.write(
+                'SQLite не поддерживает параллельную запись, '
+                'загрузка выполняется в одном процессе.')
+            workers = 1
+        created, missing_tags = create_missing_tags(path)
+        self.stdout.write(f'Создано тегов: {created}')
+        if missing_tags:
+            message = (
+                'Не найдены теги, ссылки на них будут пропущены: '
+                + ', '.join(f'{slug} ({count})'
+                            for slug, count in sorted(missing_tags.items())))
+            if options['strict']:
+                raise CommandError(message)
+            self.stderr.write(message)
+        created = create_missing_ingredients(path, chunk_size)
+        self.stdout.write(f'Создано ингредиентов: {created}')
+        if workers == 1:
+            imported, skipped = RecipeImporter(chunk_size).import_file(path)
+        else:
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                results = pool.starmap(import_partition, [
+                    (path, worker, workers, chunk_size)
+                    for worker in range(workers)])
+            imported = sum(result[0] for result in results)
+            skipped = sum(result[1] for result in results)
+        rebuild_postings()
+        thumbnails = generate_missing_thumbnails()
+        self.stdout.write(f'Создано миниатюр изображений: {thumbnails}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {imported}, пропущено: {skipped}.'))
@@ -1,26 +1,104 @@
 import csv
+import json
+import os
+import re
+from itertools import islice
 
 from backend_foodgram.settings import CSV_DIR
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from recipes.catalogs import bump_catalog_version
 from recipes.models import Ingredient
 
+FIELDS = ('name', 'measurement_unit')
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv(path):
+    """Построчно читает ингредиенты из csv файла.
+    Строка заголовка name,measurement_unit пропускается, если она есть."""
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        rows = csv.reader(csv_file)
+        for line_number, row in enumerate(rows):
+            if line_number == 0 and tuple(row) == FIELDS:
+                continue
+            name, measurement_unit = row
+            yield name, measurement_unit
+
+
+def read_json(path, chunk_size=64 * 1024):
+    """Читает ингредиенты из json файла со списком объектов,
+    декодируя объекты по одному, не загружая весь список в память."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as json_file:
+        buffer = json_file.read(chunk_size)
+        position = SEPARATORS.match(buffer).end()
+        if buffer[position:position + 1] != '[':
+            raise CommandError('Ожидается json-список ингредиентов.')
+        position += 1
+        while True:
+            position = SEPARATORS.match(buffer, position).end()
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                chunk = json_file.read(chunk_size)
+                if not chunk:
+                    raise CommandError('Некорректный json файл.')
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item['name'], item['measurement_unit']
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов из csv файла в БД.'
-
-    def handle(self, *args, **kwargs):
-        with open(
-            f'{CSV_DIR}/ingredients.csv',
-            newline='',
-            encoding='utf-8'
-        ) as csv_file:
-            rows = csv.reader(csv_file)
-            for row in rows:
-                name, measurement_unit = row
-                Ingredient.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit)
-
-        self.stdout.write(self.style.SUCCESS('Все ингредиенты загружены!'))
-
-        csv_file.close()
+    help = 'Загрузка ингредиентов из csv или json файла в БД.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(CSV_DIR, 'ingredients.csv'),
+            help='Путь к файлу .csv или .json.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать новые ингредиенты, не записывая их.')
+
+    def count_existing(self, batch):
+        existing = Ingredient.objects.filter(
+            name__in={name for name, _ in batch}
+        ).values_list('name', 'measurement_unit')
+        return len(batch & set(existing))
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        rows = reader(path)
+        total = inserted = 0
+        while True:
+            batch_rows = list(islice(rows, options['batch_size']))
+            if not batch_rows:
+                break
+            batch = set(batch_rows)
+            if options['dry_run']:
+                inserted += len(batch) - self.count_existing(batch)
+            else:
+                before = Ingredient.objects.count()
+                Ingredient.objects.bulk_create(
+                    (Ingredient(name=name, measurement_unit=measurement_unit)
+                     for name, measurement_unit in batch),
+                    ignore_conflicts=True)
+                inserted += Ingredient.objects.count() - before
+            total += len(batch_rows)
+            self.stdout.write(f'Обработано строк: {total}')
+        if inserted and not options['dry_run']:
+            bump_catalog_version('ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            f'Новых ингредиентов: {inserted}, '
+            f'пропущено: {total - inserted}'
+            f'{" (пробный запуск)" if options["dry_run"] else ""}.'))
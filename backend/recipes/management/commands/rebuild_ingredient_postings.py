@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+from recipes.pantry import rebuild_postings
+
+
+class Command(BaseCommand):
+    help = 'Пересборка обратного индекса «ингредиент — рецепты».'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rebuild_postings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Обратный индекс пересобран.'))
@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand, CommandError
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import (get_live_shopping_lists,
+                                   rebuild_shopping_lists)
+
+
+class Command(BaseCommand):
+    help = ('Пересборка таблицы списков покупок и сверка '
+            'с данными корзин пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сверить таблицу, не пересобирая её.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            rebuild_shopping_lists(batch_size=options['batch_size'])
+            self.stdout.write('Таблица списков покупок пересобрана.')
+        stored = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount').iterator()
+        }
+        live = get_live_shopping_lists()
+        mismatches = [
+            key for key in stored.keys() | live.keys()
+            if stored.get(key) != live.get(key)
+        ]
+        for user_id, ingredient_id in mismatches[:20]:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'в таблице {stored.get((user_id, ingredient_id))}, '
+                f'по корзине {live.get((user_id, ingredient_id))}')
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок совпадают, позиций: {len(stored)}.'))
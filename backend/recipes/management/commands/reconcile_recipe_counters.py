@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand, CommandError
+from recipes.counters import COUNTERS, get_drifted_recipes, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = ('Сверка счетчиков избранного и списков покупок рецептов '
+            'с фактическими данными и исправление расхождений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сверить счетчики, не исправляя их.')
+
+    def handle(self, *args, **options):
+        fields = list(COUNTERS.values())
+        drifted = list(get_drifted_recipes().values(
+            'pk', *fields, *(f'live_{field}' for field in fields)))
+        for recipe in drifted[:20]:
+            self.stdout.write(f'Рецепт {recipe["pk"]}: ' + ', '.join(
+                f'{field} {recipe[field]} → {recipe[f"live_{field}"]}'
+                for field in fields))
+        if options['check']:
+            if drifted:
+                raise CommandError(f'Расхождений: {len(drifted)}')
+        elif drifted:
+            reconcile_counters([recipe['pk'] for recipe in drifted])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов с расхождениями: {len(drifted)}'
+            f'{"" if options["check"] else ", исправлено"}.'))
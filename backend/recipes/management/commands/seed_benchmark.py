@@ -0,0 +1,192 @@
+import io
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from recipes.catalogs import bump_catalog_version
+from recipes.counters import reconcile_counters
+from recipes.images import generate_missing_thumbnails
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscription, Tag)
+from recipes.pantry import rebuild_postings
+from recipes.search import update_search_index
+from recipes.shopping_list import rebuild_shopping_lists
+from recipes.storage import content_addressed_storage
+from recipes.utils import upload_to
+
+User = get_user_model()
+
+RecipeTag = Recipe.tags.through
+
+PREFIX = 'bench_'
+PASSWORD = 'benchmark'
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'омлет', 'рагу', 'паста', 'плов',
+    'борщ', 'запеканка', 'курица', 'рыба', 'грибы', 'сыр', 'овощи',
+)
+
+
+def batched(objects, batch_size):
+    """Разбивает последовательность на списки по batch_size."""
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def create_image():
+    """Сохраняет одно изображение, общее для всех рецептов:
+    хранилище по хешу содержимого хранит его в одном файле."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (800, 600), '#c86432').save(buffer, 'JPEG')
+    return content_addressed_storage.save(
+        upload_to(Recipe(), 'image.jpg'), ContentFile(buffer.getvalue()))
+
+
+class Command(BaseCommand):
+    help = ('Наполнение БД синтетическими данными для нагрузочного '
+            'тестирования. Пользователи создаются с логином bench_N '
+            f'и паролем «{PASSWORD}».')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes-per-user', type=int, default=10)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя.')
+        parser.add_argument('--cart', type=int, default=5,
+                            help='Рецептов в корзине на пользователя.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ранее созданные данные перед наполнением.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        bench_users = User.objects.filter(username__startswith=PREFIX)
+        if options['clear']:
+            bench_users.delete()
+        elif bench_users.exists():
+            raise CommandError(
+                'Данные для тестирования уже созданы, используйте --clear.')
+        with transaction.atomic():
+            tag_ids = self.create_tags()
+            ingredient_ids = self.create_ingredients(options['ingredients'])
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(
+                user_ids, options['recipes_per_user'])
+            self.create_recipe_relations(
+                recipe_ids, tag_ids, ingredient_ids,
+                options['ingredients_per_recipe'])
+            self.create_user_relations(
+                Subscription, 'author_id', user_ids, user_ids,
+                options['subscriptions'])
+            self.create_user_relations(
+                Favorite, 'recipe_id', user_ids, recipe_ids,
+                options['favorites'])
+            self.create_user_relations(
+                ShoppingCart, 'recipe_id', user_ids, recipe_ids,
+                options['cart'])
+        reconcile_counters()
+        rebuild_shopping_lists(batch_size=self.batch_size)
+        rebuild_postings(batch_size=self.batch_size)
+        update_search_index()
+        generate_missing_thumbnails()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}.'))
+
+    def create_tags(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=f'{PREFIX}{number}', slug=f'{PREFIX}{number}',
+                    color=f'#{number * 0x333333:06X}')
+                for number in range(1, 4))
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_ingredients(self, count):
+        existing = Ingredient.objects.count()
+        if existing < count:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=f'{PREFIX}{number}', measurement_unit='г')
+                 for number in range(existing, count)),
+                batch_size=self.batch_size, ignore_conflicts=True)
+            bump_catalog_version('ingredients')
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (User(username=f'{PREFIX}{number}',
+                  email=f'{PREFIX}{number}@example.com',
+                  first_name='Тест', last_name=f'Пользователь {number}',
+                  password=password)
+             for number in range(count)),
+            batch_size=self.batch_size)
+        return list(User.objects.filter(
+            username__startswith=PREFIX).values_list('id', flat=True))
+
+    def create_recipes(self, user_ids, recipes_per_user):
+        image = create_image()
+        Recipe.objects.bulk_create(
+            (Recipe(
+                author_id=user_id, image=image,
+                name=' '.join(self.random.sample(WORDS, 3)) + f' {number}',
+                text=' '.join(self.random.choices(WORDS, k=40)),
+                cooking_time=self.random.randint(5, 180))
+             for user_id in user_ids for number in range(recipes_per_user)),
+            batch_size=self.batch_size)
+        recipes = list(Recipe.objects.filter(author_id__in=user_ids))
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                minutes=self.random.randint(0, 60 * 24 * 365))
+        Recipe.objects.bulk_update(
+            recipes, ['pub_date'], batch_size=self.batch_size)
+        return [recipe.id for recipe in recipes]
+
+    def create_recipe_relations(self, recipe_ids, tag_ids, ingredient_ids,
+                                ingredients_per_recipe):
+        ingredients_per_recipe = min(
+            ingredients_per_recipe, len(ingredient_ids))
+        for batch in batched(recipe_ids, self.batch_size):
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in batch
+                for tag_id in self.random.sample(
+                    tag_ids, self.random.randint(1, min(2, len(tag_ids)))))
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500))
+                for recipe_id in batch
+                for ingredient_id in self.random.sample(
+                    ingredient_ids, ingredients_per_recipe))
+
+    def create_user_relations(self, model, target_field, user_ids,
+                              target_ids, per_user):
+        """Связывает каждого пользователя с per_user случайными
+        объектами (подписки, избранное, корзина)."""
+        objects = (
+            model(user_id=user_id, **{target_field: target_id})
+            for user_id in user_ids
+            for target_id in self.random.sample(
+                target_ids, min(per_user, len(target_ids)))
+            if target_id != user_id or target_field != 'author_id'
+        )
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
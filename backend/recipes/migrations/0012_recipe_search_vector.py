@@ -0,0 +1,75 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:52
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    'CREATE INDEX recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)',
+    '''
+    UPDATE recipes_recipe SET search_vector =
+        setweight(to_tsvector('russian', recipes_recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(recipes_ingredient.name, ' ')
+            FROM recipes_recipeingredient
+            JOIN recipes_ingredient
+                ON recipes_ingredient.id
+                = recipes_recipeingredient.ingredient_id
+            WHERE recipes_recipeingredient.recipe_id = recipes_recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', recipes_recipe.text), 'C')
+    ''',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin',
+]
+
+SQLITE_FORWARD = [
+    'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+    'name, ingredients, text, tokenize="unicode61")',
+    '''
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+    SELECT recipes_recipe.id, recipes_recipe.name, coalesce((
+        SELECT group_concat(recipes_ingredient.name, ' ')
+        FROM recipes_recipeingredient
+        JOIN recipes_ingredient
+            ON recipes_ingredient.id = recipes_recipeingredient.ingredient_id
+        WHERE recipes_recipeingredient.recipe_id = recipes_recipe.id
+    ), ''), recipes_recipe.text
+    FROM recipes_recipe
+    ''',
+]
+
+SQLITE_BACKWARD = [
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+]
+
+
+def run_for_vendor(postgres_statements, sqlite_statements):
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgres_statements,
+            'sqlite': sqlite_statements,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_tags_tag_recipe_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD)),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:53
+
+from array import array
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_postings(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    IngredientPosting = apps.get_model('recipes', 'IngredientPosting')
+    recipes_by_ingredient = defaultdict(list)
+    for ingredient_id, recipe_id in RecipeIngredient.objects.order_by(
+            'ingredient_id', 'recipe_id').values_list(
+            'ingredient_id', 'recipe_id').iterator():
+        recipes_by_ingredient[ingredient_id].append(recipe_id)
+    IngredientPosting.objects.bulk_create(
+        (IngredientPosting(
+            ingredient_id=ingredient_id,
+            recipe_ids=array('Q', recipe_ids).tobytes())
+         for ingredient_id, recipe_ids in recipes_by_ingredient.items()),
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPosting',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='posting', serialize=False, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('recipe_ids', models.BinaryField(verbose_name='id рецептов')),
+            ],
+            options={
+                'verbose_name': 'Рецепты ингредиента',
+                'verbose_name_plural': 'Рецепты ингредиентов',
+            },
+        ),
+        migrations.RunPython(build_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:55
+
+from django.db import migrations, models
+import recipes.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_ingredientposting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail_medium',
+            field=models.ImageField(blank=True, editable=False, upload_to=recipes.utils.upload_to, verbose_name='Миниатюра для карточки'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail_small',
+            field=models.ImageField(blank=True, editable=False, upload_to=recipes.utils.upload_to, verbose_name='Миниатюра для списков'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:57
+
+from django.db import migrations, models
+import recipes.storage
+import recipes.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=recipes.storage.ContentAddressedStorage(), upload_to=recipes.utils.upload_to, verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='thumbnail_medium',
+            field=models.ImageField(blank=True, editable=False, storage=recipes.storage.ContentAddressedStorage(), upload_to=recipes.utils.upload_to, verbose_name='Миниатюра для карточки'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='thumbnail_small',
+            field=models.ImageField(blank=True, editable=False, storage=recipes.storage.ContentAddressedStorage(), upload_to=recipes.utils.upload_to, verbose_name='Миниатюра для списков'),
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:58
+
+from array import array
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Объединяет ингредиенты с одинаковыми названием и единицей
+    измерения, перенося их в рецептах на ингредиент с меньшим id.
+    Удаление дублей каскадно удаляет их позиции списков покупок
+    и обратного индекса, поэтому списки покупок затронутых
+    пользователей и индекс оставшихся ингредиентов пересобираются."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).order_by().annotate(
+        keeper_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    keeper_ids = []
+    recipe_ids = set()
+    for group in duplicates:
+        keeper_id = group['keeper_id']
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=keeper_id).values_list('id', flat=True))
+        keeper_ids.append(keeper_id)
+        recipe_ids.update(RecipeIngredient.objects.filter(
+            ingredient_id__in=duplicate_ids).values_list(
+            'recipe_id', flat=True))
+        keeper_recipes = RecipeIngredient.objects.filter(
+            ingredient_id=keeper_id).values('recipe_id')
+        RecipeIngredient.objects.filter(
+            ingredient_id__in=duplicate_ids, recipe_id__in=keeper_recipes
+        ).delete()
+        for duplicate_id in duplicate_ids:
+            RecipeIngredient.objects.filter(
+                ingredient_id=duplicate_id,
+            ).exclude(
+                recipe_id__in=RecipeIngredient.objects.filter(
+                    ingredient_id=keeper_id).values('recipe_id')
+            ).update(ingredient_id=keeper_id)
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+    if keeper_ids:
+        rebuild_postings(apps, keeper_ids)
+    if recipe_ids:
+        rebuild_shopping_lists(apps, recipe_ids)
+
+
+def rebuild_postings(apps, ingredient_ids):
+    """Пересобирает обратный индекс ингредиентов, как
+    recipes.pantry.rebuild_postings."""
+    IngredientPosting = apps.get_model('recipes', 'IngredientPosting')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    recipes_by_ingredient = defaultdict(list)
+    for ingredient_id, recipe_id in RecipeIngredient.objects.filter(
+            ingredient_id__in=ingredient_ids).order_by(
+            'ingredient_id', 'recipe_id').values_list(
+            'ingredient_id', 'recipe_id'):
+        recipes_by_ingredient[ingredient_id].append(recipe_id)
+    IngredientPosting.objects.filter(
+        ingredient_id__in=ingredient_ids).delete()
+    IngredientPosting.objects.bulk_create(
+        IngredientPosting(
+            ingredient_id=ingredient_id,
+            recipe_ids=array('Q', recipe_ids).tobytes())
+        for ingredient_id, recipe_ids in recipes_by_ingredient.items())
+
+
+def rebuild_shopping_lists(apps, recipe_ids):
+    """Пересобирает списки покупок пользователей, у которых
+    в корзине есть рецепты из recipe_ids, как
+    recipes.shopping_list.rebuild_shopping_lists."""
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    user_ids = set(ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids).values_list('user_id', flat=True))
+    if not user_ids:
+        return
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['recipe__shopping_cart__user'],
+            ingredient_id=row['ingredient'], total_amount=row['amount'])
+        for row in RecipeIngredient.objects.filter(
+            recipe__shopping_cart__user_id__in=user_ids
+        ).values(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).order_by().annotate(amount=Sum('amount')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_unit'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.19 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+POSTGRES_FORWARD = [
+    'CREATE INDEX IF NOT EXISTS recipes_recipeingredient_recipe_cover '
+    'ON recipes_recipeingredient (recipe_id) INCLUDE (ingredient_id, amount)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS recipes_recipeingredient_recipe_cover',
+]
+
+
+def run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """Индексы под основные запросы: лента и пагинация по курсору
+    (-pub_date, -id), выгрузка списка покупок (user, -total_amount)
+    и покрывающий индекс ингредиентов рецепта для пересчета
+    списков покупок без чтения таблицы."""
+
+    dependencies = [
+        ('recipes', '0018_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglistitem',
+            index=models.Index(fields=['user', '-total_amount'], name='shoppinglistitem_amount_idx'),
+        ),
+        migrations.RunPython(
+            run_on_postgres(POSTGRES_FORWARD),
+            run_on_postgres(POSTGRES_BACKWARD)),
+    ]
@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
 
+from .storage import content_addressed_storage
 from .utils import upload_to
 
 User = get_user_model()
@@ -22,6 +24,12 @@ class Ingredient(models.Model):
         ordering = ["name"]
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique_ingredient_unit"
+            )
+        ]
 
     def __str__(self):
         return f"{self.name}, ({self.measurement_unit})"
@@ -63,7 +71,18 @@ class Recipe(models.Model):
         verbose_name="Название рецепта", max_length=200, db_index=True
     )
     text = models.TextField(verbose_name="Описание")
-    image = models.ImageField(verbose_name="Изображение", upload_to=upload_to)
+    image = models.ImageField(
+        verbose_name="Изображение", upload_to=upload_to,
+        storage=content_addressed_storage
+    )
+    thumbnail_small = models.ImageField(
+        verbose_name="Миниатюра для списков", upload_to=upload_to,
+        storage=content_addressed_storage, blank=True, editable=False
+    )
+    thumbnail_medium = models.ImageField(
+        verbose_name="Миниатюра для карточки", upload_to=upload_to,
+        storage=content_addressed_storage, blank=True, editable=False
+    )
     pub_date = models.DateTimeField(
         verbose_name="Дата создания", auto_now_add=True
     )
@@ -78,6 +97,16 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField(
         Ingredient, through="RecipeIngredient", verbose_name="ингредиенты"
     )
+    search_vector = SearchVectorField(null=True, editable=False)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном", default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок", default=0, editable=False
+    )
+
+    COUNTER_FIELDS = ("favorites_count", "in_carts_count")
+    WORKER_FIELDS = ("thumbnail_small", "thumbnail_medium", "search_vector")
 
     class Meta:
         ordering = ["-pub_date", "name"]
@@ -89,10 +118,40 @@ class Recipe(models.Model):
                 fields=["name", "author"], name="unique_recipe_author"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=[
+                    "-favorites_count", "-in_carts_count", "-pub_date", "-id"
+                ],
+                name="recipe_popular_idx"
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="recipe_author_pub_date_idx"
+            ),
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Счетчики избранного и списков покупок, миниатюры
+        и поисковый вектор меняются только отдельными UPDATE
+        из сигналов и фоновых задач, поэтому при сохранении
+        загруженного рецепта они не перезаписываются значениями
+        из памяти."""
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.name not in self.WORKER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class RecipeIngredient(models.Model):
     """Промежуточная модель для связи рецепта и ингредиента."""
@@ -187,3 +246,59 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f"{self.user} подписан на {self.author}"
+
+
+class ShoppingListItem(models.Model):
+    """Итоговое количество ингредиента в списке покупок пользователя.
+    Денормализованная таблица, обновляется при изменении списка покупок
+    и ингредиентов рецептов из него."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        verbose_name="Пользователь"
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        verbose_name="Ингредиент"
+    )
+    total_amount = models.PositiveIntegerField(verbose_name="Количество")
+
+    class Meta:
+        ordering = ["user", "-total_amount"]
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Позиции списков покупок"
+        default_related_name = "shopping_list_items"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_user_ingredient"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-total_amount"],
+                name="shoppinglistitem_amount_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient} — {self.total_amount}"
+
+
+class IngredientPosting(models.Model):
+    """Обратный индекс: отсортированный список id рецептов,
+    в которых используется ингредиент.
+    Хранится упакованным массивом 64-битных целых чисел."""
+
+    ingredient = models.OneToOneField(
+        Ingredient, on_delete=models.CASCADE, primary_key=True,
+        related_name="posting", verbose_name="Ингредиент"
+    )
+    recipe_ids = models.BinaryField(verbose_name="id рецептов")
+
+    class Meta:
+        verbose_name = "Рецепты ингредиента"
+        verbose_name_plural = "Рецепты ингредиентов"
+
+    def __str__(self):
+        return f"{self.ingredient}"
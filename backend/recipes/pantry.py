@@ -0,0 +1,114 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import IngredientPosting, RecipeIngredient
+
+
+def encode_ids(ids):
+    """Упаковывает отсортированные id рецептов в байты."""
+    return array('Q', ids).tobytes()
+
+
+def decode_ids(data):
+    """Распаковывает id рецептов из байтов."""
+    ids = array('Q')
+    ids.frombytes(data)
+    return ids
+
+
+@transaction.atomic
+def update_postings(recipe_id, ingredient_ids, add=True):
+    """Добавляет рецепт в списки рецептов ингредиентов
+    или удаляет его оттуда. Повторный вызов ничего не меняет."""
+    ingredient_ids = set(ingredient_ids)
+    if not ingredient_ids:
+        return
+    postings = {
+        posting.ingredient_id: posting
+        for posting in IngredientPosting.objects.select_for_update().filter(
+            ingredient_id__in=ingredient_ids)
+    }
+    to_create = []
+    to_update = []
+    for ingredient_id in ingredient_ids:
+        posting = postings.get(ingredient_id)
+        if posting is None:
+            if add:
+                to_create.append(IngredientPosting(
+                    ingredient_id=ingredient_id,
+                    recipe_ids=encode_ids([recipe_id])))
+            continue
+        ids = decode_ids(posting.recipe_ids)
+        index = bisect_left(ids, recipe_id)
+        present = index < len(ids) and ids[index] == recipe_id
+        if add and not present:
+            ids.insert(index, recipe_id)
+        elif not add and present:
+            del ids[index]
+        else:
+            continue
+        posting.recipe_ids = ids.tobytes()
+        to_update.append(posting)
+    if to_update:
+        IngredientPosting.objects.bulk_update(to_update, ['recipe_ids'])
+    if to_create:
+        IngredientPosting.objects.bulk_create(to_create)
+
+
+@transaction.atomic
+def rebuild_postings(batch_size=500):
+    """Полностью пересобирает обратный индекс ингредиентов."""
+    recipes_by_ingredient = defaultdict(list)
+    for ingredient_id, recipe_id in RecipeIngredient.objects.order_by(
+            'ingredient_id', 'recipe_id').values_list(
+            'ingredient_id', 'recipe_id').iterator():
+        recipes_by_ingredient[ingredient_id].append(recipe_id)
+    IngredientPosting.objects.all().delete()
+    IngredientPosting.objects.bulk_create(
+        (IngredientPosting(
+            ingredient_id=ingredient_id, recipe_ids=encode_ids(recipe_ids))
+         for ingredient_id, recipe_ids in recipes_by_ingredient.items()),
+        batch_size=batch_size)
+
+
+def find_recipes_by_ingredients(ingredient_ids, limit):
+    """Возвращает до limit рецептов, лучше всего покрываемых
+    переданными ингредиентами, в виде списка кортежей
+    (id рецепта, число найденных ингредиентов, число недостающих).
+    Сначала идут рецепты с большим числом найденных ингредиентов,
+    при равенстве — с меньшим числом недостающих."""
+    matched = Counter()
+    for recipe_ids in IngredientPosting.objects.filter(
+            ingredient_id__in=ingredient_ids).values_list(
+            'recipe_ids', flat=True):
+        matched.update(decode_ids(recipe_ids))
+    groups = defaultdict(list)
+    for recipe_id, count in matched.items():
+        groups[count].append(recipe_id)
+    candidates = []
+    for count in sorted(groups, reverse=True):
+        candidates.extend(groups[count])
+        if len(candidates) >= limit:
+            break
+    if not candidates:
+        return []
+    totals = dict(RecipeIngredient.objects.filter(
+        recipe_id__in=candidates).order_by().values('recipe_id').annotate(
+        total=Count('id')).values_list('recipe_id', 'total'))
+    missing = {
+        recipe_id: totals.get(recipe_id, matched[recipe_id])
+        - matched[recipe_id]
+        for recipe_id in candidates
+    }
+    ranked = sorted(
+        candidates,
+        key=lambda recipe_id: (
+            -matched[recipe_id], missing[recipe_id], -recipe_id))
+    return [
+        (recipe_id, matched[recipe_id], missing[recipe_id])
+        for recipe_id in ranked[:limit]
+    ]
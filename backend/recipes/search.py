@@ -0,0 +1,83 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+
+POSTGRES_UPDATE_SQL = f'''
+    UPDATE recipes_recipe SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', recipes_recipe.name), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+            SELECT string_agg(recipes_ingredient.name, ' ')
+            FROM recipes_recipeingredient
+            JOIN recipes_ingredient
+                ON recipes_ingredient.id
+                = recipes_recipeingredient.ingredient_id
+            WHERE recipes_recipeingredient.recipe_id = recipes_recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', recipes_recipe.text), 'C')
+'''
+
+SQLITE_DELETE_SQL = 'DELETE FROM recipes_recipe_fts'
+
+SQLITE_INSERT_SQL = '''
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+    SELECT recipes_recipe.id, recipes_recipe.name, coalesce((
+        SELECT group_concat(recipes_ingredient.name, ' ')
+        FROM recipes_recipeingredient
+        JOIN recipes_ingredient
+            ON recipes_ingredient.id = recipes_recipeingredient.ingredient_id
+        WHERE recipes_recipeingredient.recipe_id = recipes_recipe.id
+    ), ''), recipes_recipe.text
+    FROM recipes_recipe
+'''
+
+SQLITE_RANK_SQL = '''
+    SELECT -bm25(recipes_recipe_fts, 10.0, 4.0, 1.0)
+    FROM recipes_recipe_fts
+    WHERE recipes_recipe_fts MATCH %s AND rowid = recipes_recipe.id
+'''
+
+
+def update_search_index(*recipe_ids):
+    """Пересчитывает поисковый индекс для переданных рецептов,
+    а без аргументов — для всех.
+    В PostgreSQL обновляется столбец Recipe.search_vector,
+    в SQLite — виртуальная таблица FTS5 recipes_recipe_fts."""
+    where = ''
+    params = []
+    if recipe_ids:
+        where = (f' WHERE recipes_recipe.id IN '
+                 f'({", ".join(["%s"] * len(recipe_ids))})')
+        params = list(recipe_ids)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_UPDATE_SQL + where, params)
+        elif connection.vendor == 'sqlite':
+            fts_where = where.replace('recipes_recipe.id', 'rowid')
+            cursor.execute(SQLITE_DELETE_SQL + fts_where, params)
+            cursor.execute(SQLITE_INSERT_SQL + where, params)
+
+
+def search_recipes(queryset, query):
+    """Отбирает рецепты по поисковому запросу и упорядочивает
+    по релевантности (аннотация search_rank)."""
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch')
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query))
+    elif connection.vendor == 'sqlite':
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return queryset.none()
+        match = ' '.join(f'"{term}"*' for term in terms)
+        queryset = queryset.annotate(
+            search_rank=RawSQL(SQLITE_RANK_SQL, (match,))
+        ).filter(search_rank__isnull=False)
+    else:
+        return queryset.filter(name__icontains=query)
+    return queryset.order_by('-search_rank', '-pub_date', 'name')
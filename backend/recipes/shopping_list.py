@@ -0,0 +1,120 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def get_recipe_amounts(*recipe_ids):
+    """Возвращает количество ингредиентов в рецептах
+    в виде {(id рецепта, id ингредиента): количество}."""
+    return {
+        (recipe_id, ingredient_id): amount
+        for recipe_id, ingredient_id, amount
+        in RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .values_list('recipe_id', 'ingredient_id', 'amount')
+    }
+
+
+@transaction.atomic
+def apply_shopping_list_changes(changes):
+    """Применяет изменения к спискам покупок.
+    changes — словарь {(id пользователя, id ингредиента): изменение}."""
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    user_ids = {user_id for user_id, _ in changes}
+    ingredient_ids = {ingredient_id for _, ingredient_id in changes}
+    existing = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id__in=ingredient_ids)
+    }
+    to_create = []
+    to_update = []
+    to_delete = []
+    for (user_id, ingredient_id), delta in changes.items():
+        item = existing.get((user_id, ingredient_id))
+        if item is None:
+            if delta > 0:
+                to_create.append(ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=delta))
+        elif item.total_amount + delta > 0:
+            item.total_amount += delta
+            to_update.append(item)
+        else:
+            to_delete.append(item.pk)
+    if to_delete:
+        ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        ShoppingListItem.objects.bulk_update(to_update, ['total_amount'])
+    if to_create:
+        ShoppingListItem.objects.bulk_create(to_create)
+
+
+def change_recipe_in_shopping_list(user_id, recipe_id, sign=1):
+    """Добавляет (sign=1) или вычитает (sign=-1) ингредиенты рецепта
+    в списке покупок пользователя."""
+    apply_shopping_list_changes({
+        (user_id, ingredient_id): sign * amount
+        for (_, ingredient_id), amount in get_recipe_amounts(
+            recipe_id).items()
+    })
+
+
+@contextmanager
+def track_recipe_ingredients(*recipe_ids):
+    """Запоминает ингредиенты рецептов до изменения и после выхода
+    из блока переносит разницу в списки покупок пользователей,
+    у которых эти рецепты в корзине.
+    Нужен для изменений через bulk_create/bulk_update и админку,
+    которые не отправляют сигналы."""
+    before = get_recipe_amounts(*recipe_ids)
+    yield
+    after = get_recipe_amounts(*recipe_ids)
+    deltas = defaultdict(dict)
+    for key in before.keys() | after.keys():
+        delta = after.get(key, 0) - before.get(key, 0)
+        if delta:
+            recipe_id, ingredient_id = key
+            deltas[recipe_id][ingredient_id] = delta
+    if not deltas:
+        return
+    changes = defaultdict(int)
+    for user_id, recipe_id in ShoppingCart.objects.filter(
+            recipe_id__in=deltas).values_list('user_id', 'recipe_id'):
+        for ingredient_id, delta in deltas[recipe_id].items():
+            changes[(user_id, ingredient_id)] += delta
+    apply_shopping_list_changes(changes)
+
+
+def get_live_shopping_lists(user_ids=None):
+    """Считает списки покупок по корзинам пользователей
+    в виде {(id пользователя, id ингредиента): количество}."""
+    queryset = RecipeIngredient.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(recipe__shopping_cart__user_id__in=user_ids)
+    return {
+        (row['recipe__shopping_cart__user'], row['ingredient']): row['amount']
+        for row in queryset.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).order_by().annotate(amount=Sum('amount')).iterator()
+    }
+
+
+@transaction.atomic
+def rebuild_shopping_lists(batch_size=1000):
+    """Полностью пересобирает таблицу списков покупок."""
+    ShoppingListItem.objects.all().delete()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id,
+            total_amount=amount)
+         for (user_id, ingredient_id), amount
+         in get_live_shopping_lists().items()),
+        batch_size=batch_size)
@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .counters import change_recipe_counter
+from .ingredient_index import ingredient_index
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart)
+from .pantry import update_postings
+from .search import update_search_index
+from .shopping_list import change_recipe_in_shopping_list
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(sender, instance, created, **kwargs):
+    """Добавляет ингредиенты рецепта в список покупок."""
+    if created:
+        change_recipe_in_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(sender, instance, **kwargs):
+    """Вычитает ингредиенты рецепта из списка покупок.
+    Срабатывает до каскадного удаления ингредиентов рецепта."""
+    change_recipe_in_shopping_list(
+        instance.user_id, instance.recipe_id, sign=-1)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Сбрасывает индекс автодополнения ингредиентов."""
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reindex_recipe(sender, instance, **kwargs):
+    """Обновляет поисковый индекс рецепта после завершения транзакции,
+    когда ингредиенты рецепта уже сохранены."""
+    transaction.on_commit(lambda: update_search_index(instance.pk))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def reindex_recipe_ingredients(sender, instance, **kwargs):
+    """Обновляет поисковый индекс рецепта при изменении его ингредиентов
+    не через сериализатор, например в админке."""
+    transaction.on_commit(lambda: update_search_index(instance.recipe_id))
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    """Обновляет поисковый индекс рецептов при переименовании
+    ингредиента."""
+    if created:
+        return
+    recipe_ids = list(RecipeIngredient.objects.filter(
+        ingredient=instance).values_list('recipe_id', flat=True))
+    if recipe_ids:
+        transaction.on_commit(lambda: update_search_index(*recipe_ids))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def add_recipe_to_postings(sender, instance, created, **kwargs):
+    """Добавляет рецепт в обратный индекс ингредиента."""
+    if created:
+        update_postings(instance.recipe_id, [instance.ingredient_id])
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_recipe_from_postings(sender, instance, **kwargs):
+    """Удаляет рецепт из обратного индекса ингредиента."""
+    update_postings(
+        instance.recipe_id, [instance.ingredient_id], add=False)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    """Увеличивает счетчик рецепта в избранном или в списках покупок."""
+    if created:
+        change_recipe_counter(sender, instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    """Уменьшает счетчик рецепта, в том числе при каскадном удалении
+    вместе с пользователем или рецептом."""
+    change_recipe_counter(sender, instance.recipe_id, -1)
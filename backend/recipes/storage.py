@@ -0,0 +1,37 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, в котором имя файла — хэш его содержимого.
+    Одинаковые файлы хранятся один раз: при повторной загрузке
+    возвращается имя уже сохраненного файла, а время его изменения
+    обновляется.
+    Файлы никогда не перезаписываются, поэтому их можно
+    кэшировать без ограничения срока."""
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        content_hash = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(
+            os.path.dirname(name), content_hash[:2],
+            f'{content_hash}{extension}')
+        try:
+            # Свежее время изменения защищает повторно загруженный
+            # файл от удаления collect_media_garbage.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super()._save(name, content)
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
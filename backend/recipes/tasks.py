@@ -0,0 +1,40 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Пул фоновых обработчиков процесса. Создается при первом
+    обращении, чтобы не переживать fork воркеров gunicorn."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='background')
+        return _executor
+
+
+def run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s%s', func.__name__, args)
+    finally:
+        connection.close()
+
+
+def enqueue(func, *args):
+    """Ставит задачу в локальную очередь фоновых обработчиков.
+    При BACKGROUND_TASKS_ASYNC = False задача выполняется сразу."""
+    if not settings.BACKGROUND_TASKS_ASYNC:
+        return func(*args)
+    return get_executor().submit(run_task, func, *args)
@@ -0,0 +1,406 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from recipes.images import reset_thumbnails
+from recipes.models import (Favorite, Ingredient, IngredientPosting, Recipe,
+                            RecipeIngredient, ShoppingCart, ShoppingListItem,
+                            Tag)
+from recipes.pantry import decode_ids, encode_ids, update_postings
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class ShoppingListTests(TestCase):
+    """Таблица списков покупок совпадает с корзинами пользователей
+    после изменений через API и каскадных удалений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password')
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Покупатель', last_name='Продуктов',
+            password='password')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        cls.flour, cls.milk, cls.eggs = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('мука', 'г'), ('молоко', 'мл'),
+                               ('яйца', 'шт')))
+        cls.pancakes = cls.create_recipe(
+            'Блины', {cls.flour: 200, cls.milk: 500})
+        cls.omelette = cls.create_recipe(
+            'Омлет', {cls.milk: 100, cls.eggs: 3})
+
+    @classmethod
+    def create_recipe(cls, name, amounts):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text=name, cooking_time=10,
+            image='recipes/images/image.jpg')
+        recipe.tags.set([cls.tag])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in amounts.items())
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_shopping_list(self, user=None):
+        return dict(ShoppingListItem.objects.filter(
+            user=user or self.user).values_list(
+            'ingredient_id', 'total_amount'))
+
+    def assert_consistent(self):
+        call_command('rebuild_shopping_lists', check=True, stdout=StringIO())
+
+    def add_to_cart(self, recipe):
+        response = self.client.post(
+            f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+
+    def test_add_and_remove_recipe(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.omelette)
+        self.assertEqual(self.get_shopping_list(), {
+            self.flour.id: 200, self.milk.id: 600, self.eggs.id: 3})
+        self.assert_consistent()
+        response = self.client.delete(
+            f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_shopping_list(), {
+            self.milk.id: 100, self.eggs.id: 3})
+        self.assert_consistent()
+
+    def test_update_recipe_ingredients(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.omelette)
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.patch(
+            f'/api/recipes/{self.pancakes.id}/', {
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.milk.id, 'amount': 300},
+                    {'id': self.eggs.id, 'amount': 2},
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_shopping_list(), {
+            self.milk.id: 400, self.eggs.id: 5})
+        self.assert_consistent()
+
+    def test_delete_recipe(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.omelette)
+        self.pancakes.delete()
+        self.assertEqual(self.get_shopping_list(), {
+            self.milk.id: 100, self.eggs.id: 3})
+        self.assert_consistent()
+
+    def test_delete_user(self):
+        self.add_to_cart(self.pancakes)
+        ShoppingCart.objects.create(user=self.author, recipe=self.omelette)
+        user_id = self.user.id
+        self.user.delete()
+        self.assertFalse(ShoppingListItem.objects.filter(
+            user_id=user_id).exists())
+        self.assertEqual(self.get_shopping_list(self.author), {
+            self.milk.id: 100, self.eggs.id: 3})
+        self.assert_consistent()
+
+    def test_delete_author(self):
+        self.add_to_cart(self.pancakes)
+        self.author.delete()
+        self.assertEqual(self.get_shopping_list(), {})
+        self.assert_consistent()
+
+
+class PantrySearchTests(TestCase):
+    """Обратный индекс ингредиентов и поиск рецептов по ним."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        cls.flour, cls.milk, cls.eggs, cls.salt = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'молоко', 'яйца', 'соль'))
+        cls.pancakes = cls.create_recipe('Блины', cls.flour, cls.milk)
+        cls.omelette = cls.create_recipe(
+            'Омлет', cls.milk, cls.eggs, cls.salt)
+        cls.boiled_eggs = cls.create_recipe('Яйца вкрутую', cls.eggs)
+
+    @classmethod
+    def create_recipe(cls, name, *ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text=name, cooking_time=10,
+            image='recipes/images/image.jpg')
+        recipe.tags.set([cls.tag])
+        for ingredient in ingredients:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1)
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, *ingredients, **params):
+        response = self.client.get('/api/recipes/by_ingredients/', {
+            'ingredients': ','.join(
+                str(ingredient.id) for ingredient in ingredients),
+            **params})
+        self.assertEqual(response.status_code, 200)
+        return [
+            (recipe['id'], recipe['matched_ingredients'],
+             recipe['missing_ingredients'])
+            for recipe in response.json()]
+
+    def get_posting(self, ingredient):
+        posting = IngredientPosting.objects.filter(
+            ingredient=ingredient).first()
+        return [] if posting is None else list(
+            decode_ids(posting.recipe_ids))
+
+    def test_encode_ids(self):
+        ids = [1, 7, 2 ** 40]
+        self.assertEqual(list(decode_ids(encode_ids(ids))), ids)
+        self.assertEqual(len(encode_ids(ids)), 8 * len(ids))
+
+    def test_update_postings(self):
+        recipe_id = self.pancakes.id
+        update_postings(recipe_id, [self.eggs.id])
+        update_postings(recipe_id, [self.eggs.id])
+        self.assertEqual(self.get_posting(self.eggs), sorted(
+            [self.omelette.id, self.boiled_eggs.id, recipe_id]))
+        update_postings(recipe_id, [self.eggs.id], add=False)
+        update_postings(recipe_id, [self.eggs.id], add=False)
+        self.assertEqual(self.get_posting(self.eggs), sorted(
+            [self.omelette.id, self.boiled_eggs.id]))
+
+    def test_ranking(self):
+        self.assertEqual(self.search(self.milk, self.eggs), [
+            (self.omelette.id, 2, 1),
+            (self.boiled_eggs.id, 1, 0),
+            (self.pancakes.id, 1, 1),
+        ])
+        self.assertEqual(
+            self.search(self.milk, self.eggs, limit=1),
+            [(self.omelette.id, 2, 1)])
+
+    def test_ingredient_change(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.patch(
+            f'/api/recipes/{self.pancakes.id}/', {
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.eggs.id, 'amount': 2},
+                    {'id': self.milk.id, 'amount': 1},
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search(self.flour), [])
+        self.assertNotIn(self.pancakes.id, self.get_posting(self.flour))
+        self.assertEqual(self.search(self.eggs, self.milk), [
+            (self.pancakes.id, 2, 0),
+            (self.omelette.id, 2, 1),
+            (self.boiled_eggs.id, 1, 0),
+        ])
+
+    def test_recipe_delete(self):
+        recipe_id = self.omelette.id
+        self.omelette.delete()
+        self.assertEqual(self.search(self.salt), [])
+        for ingredient in (self.milk, self.eggs, self.salt):
+            self.assertNotIn(recipe_id, self.get_posting(ingredient))
+        self.assertEqual(
+            self.search(self.eggs), [(self.boiled_eggs.id, 1, 0)])
+
+    def test_invalid_query(self):
+        for params in ({}, {'ingredients': ''}, {'ingredients': 'a'},
+                       {'ingredients': self.eggs.id, 'limit': 'x'}):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    '/api/recipes/by_ingredients/', params)
+                self.assertEqual(response.status_code, 400)
+
+
+class ImportRecipesTests(TestCase):
+    """Выгрузка и загрузка рецептов вместе с тегами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password')
+        tags = [Tag.objects.create(name=name, color=color, slug=slug)
+                for name, color, slug in (('Завтрак', '#E26C2D', 'breakfast'),
+                                          ('Обед', '#49B64E', 'lunch'))]
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10)
+            recipe.tags.set(tags[:number % 2 + 1])
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=flour, amount=100)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'recipes.ndjson')
+        call_command('export_recipes', self.path, stdout=StringIO(),
+                     stderr=StringIO())
+        self.links = self.get_links()
+        Recipe.objects.all().delete()
+        Tag.objects.all().delete()
+
+    def get_links(self):
+        return sorted(Recipe.tags.through.objects.values_list(
+            'recipe__name', 'tag__slug'))
+
+    def import_recipes(self, *args):
+        stderr = StringIO()
+        call_command('import_recipes', self.path, *args,
+                     stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_tags_created(self):
+        self.assertEqual(self.import_recipes(), '')
+        self.assertEqual(self.get_links(), self.links)
+        self.assertEqual(
+            Tag.objects.get(slug='lunch').color, '#49B64E')
+
+    def test_missing_tags_reported(self):
+        with open(self.path, encoding='utf-8') as ndjson_file:
+            records = [json.loads(line) for line in ndjson_file]
+        with open(self.path, 'w', encoding='utf-8') as ndjson_file:
+            for record in records:
+                record['tags'] = [tag['slug'] for tag in record['tags']]
+                ndjson_file.write(json.dumps(record) + '\n')
+        with self.assertRaisesMessage(CommandError, 'breakfast (3)'):
+            self.import_recipes('--strict')
+        self.assertFalse(Recipe.objects.exists())
+        self.assertIn('lunch (1)', self.import_recipes())
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.assertEqual(self.get_links(), [])
+
+
+class RecipeCountersTests(TestCase):
+    """Счетчики избранного и списков покупок, сортировка по популярности
+    и сохранение рецепта без перезаписи полей фоновых задач."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.user, cls.other = (
+            User.objects.create_user(
+                email=f'{username}@example.com', username=username,
+                first_name=username, last_name=username, password='password')
+            for username in ('author', 'user', 'other'))
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        cls.pancakes, cls.omelette, cls.porridge = (
+            Recipe.objects.create(
+                author=cls.author, name=name, text=name, cooking_time=10,
+                image='recipes/images/image.jpg')
+            for name in ('Блины', 'Омлет', 'Каша'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_counters(self, recipe):
+        recipe.refresh_from_db()
+        return recipe.favorites_count, recipe.in_carts_count
+
+    def assert_consistent(self):
+        call_command('reconcile_recipe_counters', check=True,
+                     stdout=StringIO())
+
+    def test_add_and_remove(self):
+        for action in ('favorite', 'shopping_cart'):
+            response = self.client.post(
+                f'/api/recipes/{self.pancakes.id}/{action}/')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_counters(self.pancakes), (1, 1))
+        response = self.client.post(
+            f'/api/recipes/{self.pancakes.id}/favorite/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_counters(self.pancakes), (1, 1))
+        self.assert_consistent()
+        response = self.client.delete(
+            f'/api/recipes/{self.pancakes.id}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_counters(self.pancakes), (0, 1))
+        response = self.client.delete(
+            f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_counters(self.pancakes), (0, 0))
+        self.assert_consistent()
+
+    def test_delete_user(self):
+        for user in (self.user, self.other):
+            Favorite.objects.create(user=user, recipe=self.pancakes)
+            ShoppingCart.objects.create(user=user, recipe=self.pancakes)
+        ShoppingCart.objects.create(user=self.user, recipe=self.omelette)
+        self.user.delete()
+        self.assertEqual(self.get_counters(self.pancakes), (1, 1))
+        self.assertEqual(self.get_counters(self.omelette), (0, 0))
+        self.assert_consistent()
+
+    def test_delete_recipe(self):
+        Favorite.objects.create(user=self.user, recipe=self.pancakes)
+        Favorite.objects.create(user=self.user, recipe=self.omelette)
+        ShoppingCart.objects.create(user=self.other, recipe=self.omelette)
+        self.pancakes.delete()
+        self.assertEqual(self.get_counters(self.omelette), (1, 1))
+        self.assert_consistent()
+        self.author.delete()
+        self.assertFalse(Favorite.objects.exists())
+        self.assertFalse(ShoppingCart.objects.exists())
+
+    def test_ordering_popular(self):
+        for user in (self.user, self.other):
+            Favorite.objects.create(user=user, recipe=self.omelette)
+        Favorite.objects.create(user=self.user, recipe=self.porridge)
+        ShoppingCart.objects.create(user=self.user, recipe=self.porridge)
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        response = self.client.get('/api/recipes/', {'ordering': 'popular'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [self.omelette.id, self.porridge.id, self.pancakes.id])
+
+    def test_save_keeps_worker_fields(self):
+        recipe = Recipe.objects.get(pk=self.pancakes.pk)
+        Favorite.objects.create(user=self.user, recipe=self.pancakes)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            thumbnail_small='recipes/thumbnails/small.jpg',
+            thumbnail_medium='recipes/thumbnails/medium.jpg')
+        recipe.name = 'Тонкие блины'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Тонкие блины')
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(
+            recipe.thumbnail_small.name, 'recipes/thumbnails/small.jpg')
+        self.assertEqual(
+            recipe.thumbnail_medium.name, 'recipes/thumbnails/medium.jpg')
+        reset_thumbnails(recipe)
+        recipe.refresh_from_db()
+        self.assertFalse(recipe.thumbnail_small)
+        self.assertFalse(recipe.thumbnail_medium)